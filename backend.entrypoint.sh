@@ -34,6 +34,11 @@ else:
     print(f"Superuser '{username}' already exists.")
 EOF
 
-python manage.py rqworker default &
+python manage.py run_workers light default &
+python manage.py rqcron core.cron &
+
+if [ "$HLS_ASYNC" = "True" ]; then
+  exec gunicorn core.asgi:application -k uvicorn_worker.UvicornWorker --workers "${WEB_WORKERS:-2}" --bind 0.0.0.0:8000
+fi
 
 exec gunicorn core.wsgi:application --bind 0.0.0.0:8000 --reload
\ No newline at end of file
@@ -0,0 +1,9 @@
+"""Periodic jobs, run by `python manage.py rqcron core.cron`."""
+from django.conf import settings
+from rq import cron
+from users.emails import SENDER_LOCK_TIMEOUT, send_queued_emails
+from users.tokens import purge_expired_tokens
+from videos.queues import LIGHT
+
+cron.register(purge_expired_tokens, queue_name=LIGHT, interval=settings.JWT_PURGE_INTERVAL)
+cron.register(send_queued_emails, queue_name=LIGHT, interval=SENDER_LOCK_TIMEOUT)
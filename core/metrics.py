@@ -0,0 +1,192 @@
+"""Prometheus metrics for requests, caches, HLS delivery and background jobs."""
+import logging
+import os
+import time
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.http import Http404, HttpResponse
+from django.utils.crypto import constant_time_compare
+from django_redis import get_redis_connection
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram
+from prometheus_client import generate_latest, multiprocess
+from prometheus_client.core import GaugeMetricFamily, HistogramMetricFamily
+from redis.exceptions import RedisError
+import django_rq
+
+logger = logging.getLogger(__name__)
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+JOB_BUCKETS = (10, 30, 60, 120, 300, 600, 1200, 1800, 3600, 7200, 14400)
+JOB_STATUSES = ['finished', 'failed']
+TRACKED_JOBS = ['convert_to_hls']
+
+REQUEST_LATENCY = Histogram(
+    'videoflix_request_duration_seconds', 'Time until the view returned a response, by URL name.',
+    ['view', 'method', 'status'], buckets=LATENCY_BUCKETS,
+)
+REQUEST_QUERIES = Histogram(
+    'videoflix_request_db_queries', 'Database queries per request.', ['view'], buckets=QUERY_BUCKETS,
+)
+REQUEST_DB_TIME = Histogram(
+    'videoflix_request_db_seconds', 'Database time per request.', ['view'], buckets=LATENCY_BUCKETS,
+)
+CACHE_LOOKUPS = Counter('videoflix_cache_lookups', 'Cache lookups by cache and result.', ['cache', 'result'])
+THROTTLED_REQUESTS = Counter(
+    'videoflix_throttled_requests', 'Requests rejected by rate limits, by scope and limiting key.', ['scope', 'key'],
+)
+HLS_BYTES = Counter('videoflix_hls_bytes', 'HLS bytes served or handed to the proxy.', ['kind'])
+HLS_CACHE_BYTES = Gauge(
+    'videoflix_hls_cache_bytes', 'Bytes held by the in-process HLS file cache.', multiprocess_mode='livesum',
+)
+HLS_CACHE_EVICTIONS = Counter('videoflix_hls_cache_evictions', 'Files evicted from the in-process HLS cache.')
+
+
+def get_job_metrics_key(job, status):
+    """Return Redis hash holding cumulative duration buckets of a job."""
+    return f'metrics:job:{job}:{status}'
+
+
+def record_job_duration(job, status, seconds):
+    """Add one job duration to the histogram shared by all workers in Redis, never failing the job."""
+    pipe = get_redis_connection('default').pipeline(transaction=False)
+    key = get_job_metrics_key(job, status)
+    for bound in JOB_BUCKETS:
+        if seconds <= bound:
+            pipe.hincrby(key, str(bound), 1)
+    pipe.hincrby(key, '+Inf', 1)
+    pipe.hincrbyfloat(key, 'sum', seconds)
+    try:
+        pipe.execute()
+    except RedisError:
+        logger.warning('Could not record duration of %s job', job, exc_info=True)
+
+
+class BackgroundCollector:
+    """Collect RQ queue sizes and job durations from Redis at scrape time."""
+
+    def describe(self):
+        """Skip the collection prometheus_client would otherwise run on register."""
+        return []
+
+    def collect(self):
+        """Yield queue and job families, leaving out any Redis cannot answer so the scrape still succeeds."""
+        families = [('RQ queue sizes', self.collect_queue_depths), ('job durations', self.collect_job_durations)]
+        for description, collect_family in families:
+            try:
+                family = collect_family()
+            except RedisError:
+                logger.warning('Could not collect %s from Redis', description, exc_info=True)
+                continue
+            yield family
+
+    def collect_queue_depths(self):
+        """Return queued, started and failed job counts of every RQ queue."""
+        depth = GaugeMetricFamily('videoflix_rq_jobs', 'RQ jobs by queue and state.', labels=['queue', 'state'])
+        for name in settings.RQ_QUEUES:
+            queue = django_rq.get_queue(name)
+            depth.add_metric([name, 'queued'], queue.count)
+            depth.add_metric([name, 'started'], queue.started_job_registry.get_job_count(cleanup=False))
+            depth.add_metric([name, 'failed'], queue.failed_job_registry.get_job_count(cleanup=False))
+        return depth
+
+    def collect_job_durations(self):
+        """Return job duration histograms recorded by the workers."""
+        family = HistogramMetricFamily(
+            'videoflix_job_duration_seconds', 'Background job duration.', labels=['job', 'status']
+        )
+        keys = [(job, status) for job in TRACKED_JOBS for status in JOB_STATUSES]
+        pipe = get_redis_connection('default').pipeline(transaction=False)
+        for job, status in keys:
+            pipe.hgetall(get_job_metrics_key(job, status))
+        for (job, status), values in zip(keys, pipe.execute()):
+            values = {key.decode(): float(value) for key, value in values.items()}
+            buckets = [(str(bound), values.get(str(bound), 0)) for bound in JOB_BUCKETS]
+            buckets.append(('+Inf', values.get('+Inf', 0)))
+            family.add_metric([job, status], buckets, values.get('sum', 0))
+        return family
+
+
+background_collector = BackgroundCollector()
+REGISTRY.register(background_collector)
+
+
+class QueryCounter:
+    """Database execute wrapper counting queries and their time."""
+
+    def __init__(self):
+        self.count = 0
+        self.seconds = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Run one query and add it to the count and time."""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.count += 1
+            self.seconds += time.perf_counter() - start
+
+
+class MetricsMiddleware:
+    """Record latency and database usage of each request by URL name."""
+
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not settings.METRICS_ENABLED:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        """Time sync requests with their database queries, handing async ones to __acall__."""
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        queries = QueryCounter()
+        start = time.perf_counter()
+        with connection.execute_wrapper(queries):
+            response = self.get_response(request)
+        observe_request(request, response, time.perf_counter() - start, queries)
+        return response
+
+    async def __acall__(self, request):
+        """Time async requests; their queries run in other threads and are not counted."""
+        start = time.perf_counter()
+        response = await self.get_response(request)
+        observe_request(request, response, time.perf_counter() - start)
+        return response
+
+
+def observe_request(request, response, elapsed, queries=None):
+    """Record one request under its URL name."""
+    match = request.resolver_match
+    view = match.url_name if match and match.url_name else 'unmatched'
+    REQUEST_LATENCY.labels(view, request.method, response.status_code).observe(elapsed)
+    if queries is not None:
+        REQUEST_QUERIES.labels(view).observe(queries.count)
+        REQUEST_DB_TIME.labels(view).observe(queries.seconds)
+
+
+def get_registry():
+    """Return registry aggregating all web processes when running multi-process."""
+    if 'PROMETHEUS_MULTIPROC_DIR' not in os.environ:
+        return REGISTRY
+    registry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    registry.register(background_collector)
+    return registry
+
+
+def metrics_view(request):
+    """Return all metrics in Prometheus text format; disabled until METRICS_TOKEN is set."""
+    token = settings.METRICS_TOKEN
+    if not settings.METRICS_ENABLED or not token:
+        raise Http404
+    if not constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return HttpResponse(status=401)
+    return HttpResponse(generate_latest(get_registry()), content_type=CONTENT_TYPE_LATEST)
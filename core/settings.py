@@ -41,9 +41,17 @@ REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticated',
     ],
+    'DEFAULT_THROTTLE_RATES': {
+        'login': os.environ.get('THROTTLE_LOGIN_RATE', '10/min'),
+        'register': os.environ.get('THROTTLE_REGISTER_RATE', '5/min'),
+        'password_reset': os.environ.get('THROTTLE_PASSWORD_RESET_RATE', '5/min'),
+        'token_refresh': os.environ.get('THROTTLE_TOKEN_REFRESH_RATE', '30/min'),
+    },
+    'NUM_PROXIES': int(os.environ.get('NUM_PROXIES', 0)),
 }
 
 MIDDLEWARE = [
+    'core.metrics.MetricsMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'whitenoise.middleware.WhiteNoiseMiddleware',
@@ -97,16 +105,31 @@ CACHES = {
     }
 }
 
+AUTH_USER_CACHE_TTL = int(os.environ.get('AUTH_USER_CACHE_TTL', 60))
+JWT_PURGE_INTERVAL = int(os.environ.get('JWT_PURGE_INTERVAL', 60 * 60))
+JWT_PURGE_BATCH_SIZE = int(os.environ.get('JWT_PURGE_BATCH_SIZE', 1000))
+
+RQ_CONNECTION = {
+    'HOST': os.environ.get("REDIS_HOST", default="redis"),
+    'PORT': os.environ.get("REDIS_PORT", default=6379),
+    'DB': os.environ.get("REDIS_DB", default=0),
+    'REDIS_CLIENT_KWARGS': {},
+}
+
+RQ_TRANSCODE_TIMEOUT = int(os.environ.get('RQ_TRANSCODE_TIMEOUT', 4 * 60 * 60))
+
 RQ_QUEUES = {
-    'default': {
-        'HOST': os.environ.get("REDIS_HOST", default="redis"),
-        'PORT': os.environ.get("REDIS_PORT", default=6379),
-        'DB': os.environ.get("REDIS_DB", default=0),
-        'DEFAULT_TIMEOUT': 900,
-        'REDIS_CLIENT_KWARGS': {},
-    },
+    'transcode_high': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': RQ_TRANSCODE_TIMEOUT},
+    'transcode_bulk': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': RQ_TRANSCODE_TIMEOUT},
+    'light': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 300},
+    'default': {**RQ_CONNECTION, 'DEFAULT_TIMEOUT': 900},
 }
 
+# Workers
+RQ_TRANSCODE_THREADS = int(os.environ.get('RQ_TRANSCODE_THREADS', 4))
+RQ_LIGHT_WORKERS = int(os.environ.get('RQ_LIGHT_WORKERS', 2))
+RQ_MAX_QUEUE_DEPTH = int(os.environ.get('RQ_MAX_QUEUE_DEPTH', 200))
+
 AUTH_PASSWORD_VALIDATORS = [
     {
         'NAME': 'django.contrib.auth.password_validation.UserAttributeSimilarityValidator',
@@ -156,6 +179,11 @@ if not EMAIL_HOST_USER or not EMAIL_HOST_PASSWORD:
 else:
     EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 
+# Queued delivery
+EMAIL_TIMEOUT = int(os.environ.get('EMAIL_TIMEOUT', 30))
+EMAIL_BATCH_SIZE = int(os.environ.get('EMAIL_BATCH_SIZE', 100))
+EMAIL_MAX_ATTEMPTS = int(os.environ.get('EMAIL_MAX_ATTEMPTS', 5))
+EMAIL_RETRY_DELAY = int(os.environ.get('EMAIL_RETRY_DELAY', 30))
 
 FRONTEND_URL = os.environ.get('FRONTEND_URL', 'http://127.0.0.1:5500')
 
@@ -164,3 +192,43 @@ CORS_ALLOWED_ORIGINS = os.environ.get(
     'http://localhost:5500,http://127.0.0.1:5500'
 ).split(',')
 CORS_ALLOW_CREDENTIALS = True
+
+# Video Processing
+HLS_SINGLE_PASS = os.environ.get('HLS_SINGLE_PASS', 'True') == 'True'
+HLS_FAN_OUT = os.environ.get('HLS_FAN_OUT', 'False') == 'True'
+HLS_RENDITION_RETRIES = int(os.environ.get('HLS_RENDITION_RETRIES', 3))
+HLS_PROGRESSIVE = os.environ.get('HLS_PROGRESSIVE', 'True') == 'True'
+HLS_CHUNK_SECONDS = int(os.environ.get('HLS_CHUNK_SECONDS', 120))
+HLS_CHUNK_MIN_DURATION = int(os.environ.get('HLS_CHUNK_MIN_DURATION', 900))
+HLS_CHUNK_WORKERS = int(os.environ.get('HLS_CHUNK_WORKERS', os.cpu_count() or 1))
+HLS_FFMPEG_THREADS = int(os.environ.get('HLS_FFMPEG_THREADS', 0))
+
+# Uploads
+UPLOAD_MAX_SIZE = int(os.environ.get('UPLOAD_MAX_SIZE', 20 * 1024 ** 3))
+
+# Video Catalog
+VIDEO_PAGE_SIZE = int(os.environ.get('VIDEO_PAGE_SIZE', 24))
+VIDEO_MAX_PAGE_SIZE = int(os.environ.get('VIDEO_MAX_PAGE_SIZE', 100))
+
+# HLS Delivery
+HLS_OFFLOAD = os.environ.get('HLS_OFFLOAD', '')
+HLS_ASYNC = os.environ.get('HLS_ASYNC', 'False') == 'True'
+HLS_ACCEL_PREFIX = os.environ.get('HLS_ACCEL_PREFIX', '/protected/hls/')
+HLS_SIGNED_URLS = os.environ.get('HLS_SIGNED_URLS', 'False') == 'True'
+HLS_SIGNED_URL_TTL = int(os.environ.get('HLS_SIGNED_URL_TTL', 3 * 60 * 60))
+HLS_HOT_CACHE_BYTES = int(os.environ.get('HLS_HOT_CACHE_BYTES', 64 * 1024 ** 2))
+HLS_HOT_CACHE_SEGMENTS = int(os.environ.get('HLS_HOT_CACHE_SEGMENTS', 3))
+HLS_HOT_CACHE_MANIFEST_TTL = float(os.environ.get('HLS_HOT_CACHE_MANIFEST_TTL', 2))
+HLS_MANIFEST_CACHE_CONTROL = {'private': True, 'max_age': 5}
+HLS_SEGMENT_CACHE_CONTROL = {
+    'public' if HLS_SIGNED_URLS else 'private': True,
+    'max_age': 31536000,
+    'immutable': True,
+}
+
+if HLS_ASYNC:
+    MIDDLEWARE.remove('whitenoise.middleware.WhiteNoiseMiddleware')
+
+# Metrics
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True') == 'True'
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
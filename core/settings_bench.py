@@ -0,0 +1,38 @@
+"""
+Settings for local API benchmarks against SQLite and fakeredis.
+"""
+
+import os
+import tempfile
+from .settings import *  # noqa: F401,F403
+from .settings import CACHES, REST_FRAMEWORK, RQ_QUEUES
+
+DEBUG = False
+ALLOWED_HOSTS = ['testserver', 'localhost', '127.0.0.1']
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.environ.get('BENCH_DB_NAME', tempfile.gettempdir() + '/videoflix-bench.sqlite3'),
+        'OPTIONS': {'timeout': 30},
+    }
+}
+
+try:
+    from fakeredis import FakeConnection
+except ImportError:
+    FakeConnection = None
+
+if FakeConnection:
+    CACHES['default']['OPTIONS']['CONNECTION_POOL_KWARGS'] = {'connection_class': FakeConnection}
+
+RQ_QUEUES = {name: {'USE_REDIS_CACHE': 'default'} for name in RQ_QUEUES}
+
+REST_FRAMEWORK = {
+    **REST_FRAMEWORK,
+    'DEFAULT_THROTTLE_RATES': {scope: '100000/min' for scope in REST_FRAMEWORK['DEFAULT_THROTTLE_RATES']},
+}
+
+MEDIA_ROOT = os.environ.get('BENCH_MEDIA_ROOT', tempfile.gettempdir() + '/videoflix-bench-media')
+
+EMAIL_BACKEND = 'django.core.mail.backends.locmem.EmailBackend'
@@ -1,3 +1,28 @@
+"""Admin configuration for user models."""
 from django.contrib import admin
+from .models import FailedEmail
+from .utils import resend_email
 
-# Register your models here.
+
+@admin.register(FailedEmail)
+class FailedEmailAdmin(admin.ModelAdmin):
+    """Admin interface for undeliverable transactional emails."""
+
+    list_display = ['kind', 'recipient', 'attempts', 'created_at']
+    list_filter = ['kind', 'created_at']
+    search_fields = ['recipient', 'error']
+    readonly_fields = ['kind', 'recipient', 'user', 'attempts', 'error', 'created_at']
+    actions = ['resend']
+
+    @admin.action(description='Resend selected emails')
+    def resend(self, request, queryset):
+        """Queue selected emails again with new token links and remove their dead letters."""
+        queued = kept = 0
+        for failed in queryset.select_related('user'):
+            if failed.user is None:
+                kept += 1
+                continue
+            resend_email(failed.kind, failed.user)
+            failed.delete()
+            queued += 1
+        self.message_user(request, f'{queued} emails queued, {kept} without a user kept.')
@@ -1,5 +1,22 @@
 """Custom JWT authentication using HTTP-only cookies."""
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
 from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.settings import api_settings
+from core.metrics import CACHE_LOOKUPS
+
+USER_CACHE_FIELDS = ['id', 'username', 'email', 'is_active', 'is_staff', 'is_superuser']
+
+
+def get_user_cache_key(user_id):
+    """Return cache key for authenticated user data."""
+    return f'auth:user:{user_id}'
+
+
+def invalidate_cached_user(user_id):
+    """Remove cached user data so the next request reloads it."""
+    cache.delete(get_user_cache_key(user_id))
 
 
 class CookieJWTAuthentication(JWTAuthentication):
@@ -12,4 +29,46 @@ class CookieJWTAuthentication(JWTAuthentication):
             return None
         validated_token = self.get_validated_token(access_token)
         user = self.get_user(validated_token)
-        return (user, validated_token)
\ No newline at end of file
+        return (user, validated_token)
+
+    def get_user(self, validated_token):
+        """Return user from cache, loading it from the database on a miss."""
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        fields = cache.get(get_user_cache_key(user_id)) if user_id is not None else None
+        if fields is None:
+            CACHE_LOOKUPS.labels('user', 'miss').inc()
+            user = super().get_user(validated_token)
+            self.cache_user(user)
+            return user
+        CACHE_LOOKUPS.labels('user', 'hit').inc()
+        return self.build_cached_user(fields)
+
+    def build_cached_user(self, fields):
+        """Rebuild a user from cached fields, passed to from_db in model field order."""
+        names = [field.attname for field in self.user_model._meta.concrete_fields if field.attname in fields]
+        return self.user_model.from_db('default', names, [fields[name] for name in names])
+
+    def cache_user(self, user):
+        """Store fields needed by permission checks for a short time."""
+        fields = {field: getattr(user, field) for field in USER_CACHE_FIELDS}
+        cache.set(get_user_cache_key(user.pk), fields, settings.AUTH_USER_CACHE_TTL)
+
+    async def aauthenticate(self, request):
+        """Async variant of authenticate for views served by an ASGI server."""
+        access_token = request.COOKIES.get('access_token')
+        if not access_token:
+            return None
+        validated_token = self.get_validated_token(access_token)
+        user = await self.aget_user(validated_token)
+        return (user, validated_token)
+
+    async def aget_user(self, validated_token):
+        """Async variant of get_user; the thread-safe cache read skips the shared sync thread."""
+        user_id = validated_token.get(api_settings.USER_ID_CLAIM)
+        fields = None
+        if user_id is not None:
+            fields = await sync_to_async(cache.get, thread_sensitive=False)(get_user_cache_key(user_id))
+        if fields is None:
+            return await sync_to_async(self.get_user)(validated_token)
+        CACHE_LOOKUPS.labels('user', 'hit').inc()
+        return self.build_cached_user(fields)
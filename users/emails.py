@@ -0,0 +1,124 @@
+"""Queued transactional email with batched delivery, retries and dead letters."""
+import json
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.template.loader import render_to_string
+from django_redis import get_redis_connection
+from redis.exceptions import LockError
+import django_rq
+from videos.queues import LIGHT
+
+OUTBOX_KEY = 'email:outbox'
+PROCESSING_KEY = 'email:processing'
+SENDER_SCHEDULED_KEY = 'email:sender'
+SENDER_SCHEDULED_TIMEOUT = 300
+SENDER_LOCK_KEY = 'email:sending'
+SENDER_LOCK_TIMEOUT = 300
+SUBJECTS = {
+    'activation': 'Confirm your email',
+    'password_reset': 'Reset your Password',
+}
+
+
+def queue_email(kind, recipient, context, attempts=0, user_id=None):
+    """Add a message to the outbox and schedule a sender job unless one is pending."""
+    message = json.dumps({
+        'kind': kind, 'to': recipient, 'context': context, 'attempts': attempts, 'user_id': user_id,
+    })
+    pipe = get_redis_connection('default').pipeline(transaction=False)
+    pipe.rpush(OUTBOX_KEY, message)
+    pipe.set(SENDER_SCHEDULED_KEY, 1, nx=True, ex=SENDER_SCHEDULED_TIMEOUT)
+    _, scheduled = pipe.execute()
+    if scheduled:
+        queue = django_rq.get_queue(LIGHT, autocommit=True)
+        queue.enqueue('users.emails.send_queued_emails')
+
+
+def send_queued_emails():
+    """Drain the outbox as the single sender, leaving it to the running sender or cron if one is active."""
+    connection = get_redis_connection('default')
+    lock = connection.lock(SENDER_LOCK_KEY, timeout=SENDER_LOCK_TIMEOUT)
+    if not lock.acquire(blocking=False):
+        return
+    try:
+        connection.delete(SENDER_SCHEDULED_KEY)
+        restore_processing(connection)
+        while True:
+            batch = claim_batch(connection, settings.EMAIL_BATCH_SIZE)
+            if not batch:
+                return
+            send_batch(connection, batch)
+            lock.reacquire()
+    finally:
+        try:
+            lock.release()
+        except LockError:
+            pass
+
+
+def restore_processing(connection):
+    """Move messages left in the processing list back to the front of the outbox."""
+    while connection.lmove(PROCESSING_KEY, OUTBOX_KEY, 'RIGHT', 'LEFT') is not None:
+        pass
+
+
+def claim_batch(connection, size):
+    """Atomically move up to size messages from the outbox to the processing list."""
+    pipe = connection.pipeline()
+    for _ in range(size):
+        pipe.lmove(OUTBOX_KEY, PROCESSING_KEY, 'LEFT', 'RIGHT')
+    return [message for message in pipe.execute() if message is not None]
+
+
+def send_batch(connection, batch):
+    """Send messages over one mail connection, dropping each from processing once sent or failed."""
+    mail = get_connection()
+    for i, raw in enumerate(batch):
+        message = json.loads(raw)
+        try:
+            mail.open()
+        except Exception as error:
+            for pending in batch[i:]:
+                handle_failure(json.loads(pending), error)
+                connection.lrem(PROCESSING_KEY, 1, pending)
+            return
+        try:
+            build_email(message, mail).send()
+        except Exception as error:
+            mail.close()
+            handle_failure(message, error)
+        connection.lrem(PROCESSING_KEY, 1, raw)
+    mail.close()
+
+
+def build_email(message, connection):
+    """Render text and HTML bodies of a queued message."""
+    kind, context = message['kind'], message['context']
+    email = EmailMultiAlternatives(
+        subject=SUBJECTS[kind],
+        body=render_to_string(f'users/emails/{kind}.txt', context).strip(),
+        from_email=settings.DEFAULT_FROM_EMAIL,
+        to=[message['to']],
+        connection=connection,
+    )
+    email.attach_alternative(render_to_string(f'users/emails/{kind}.html', context), 'text/html')
+    return email
+
+
+def handle_failure(message, error):
+    """Requeue message with exponential backoff or record it as dead letter without its token links."""
+    attempts = message['attempts'] + 1
+    user_id = message.get('user_id')
+    if attempts >= settings.EMAIL_MAX_ATTEMPTS:
+        from .models import FailedEmail
+        FailedEmail.objects.create(
+            kind=message['kind'], recipient=message['to'], user_id=user_id,
+            attempts=attempts, error=f'{type(error).__name__}: {error}',
+        )
+        return
+    delay = timedelta(seconds=settings.EMAIL_RETRY_DELAY * 2 ** (attempts - 1))
+    queue = django_rq.get_queue(LIGHT)
+    queue.enqueue_in(
+        delay, 'users.emails.queue_email', message['kind'], message['to'], message['context'], attempts, user_id
+    )
@@ -0,0 +1,38 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:40
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def link_recipients(apps, schema_editor):
+    """Attach existing dead letters to the user with the recipient address."""
+    FailedEmail = apps.get_model('users', 'FailedEmail')
+    User = apps.get_model('auth', 'User')
+    for failed in FailedEmail.objects.filter(user__isnull=True).iterator():
+        failed.user = User.objects.filter(email=failed.recipient).first()
+        if failed.user:
+            failed.save(update_fields=['user'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('users', '0001_failed_email'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='failedemail',
+            name='user',
+            field=models.ForeignKey(
+                blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, to=settings.AUTH_USER_MODEL
+            ),
+        ),
+        migrations.RunPython(link_recipients, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='failedemail',
+            name='context',
+        ),
+    ]
@@ -1,3 +1,35 @@
+"""Email dead letters and signal handlers for user authentication."""
+from django.contrib.auth.models import User
 from django.db import models
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+from .authentication import invalidate_cached_user
 
-# Create your models here.
+
+class FailedEmail(models.Model):
+    """Transactional email that could not be delivered after all retries."""
+
+    kind = models.CharField(max_length=50)
+    recipient = models.EmailField()
+    user = models.ForeignKey(User, on_delete=models.SET_NULL, null=True, blank=True)
+    attempts = models.PositiveIntegerField(default=0)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.kind} to {self.recipient}'
+
+
+@receiver(post_save, sender=User)
+def user_post_save(sender, instance, **kwargs):
+    """Drop cached user data after activation or password changes."""
+    invalidate_cached_user(instance.pk)
+
+
+@receiver(post_delete, sender=User)
+def user_post_delete(sender, instance, **kwargs):
+    """Drop cached user data of deleted users."""
+    invalidate_cached_user(instance.pk)
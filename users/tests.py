@@ -1,3 +1,254 @@
-from django.test import TestCase
+import time
+from datetime import timedelta
+from unittest import mock, skipUnless
+from asgiref.sync import async_to_sync
+from django.contrib.admin.sites import site
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.permissions import AllowAny
+from rest_framework.response import Response
+from rest_framework.test import APIRequestFactory
+from rest_framework.views import APIView
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import AccessToken
+from .admin import FailedEmailAdmin
+from .authentication import CookieJWTAuthentication, get_user_cache_key
+from .emails import SENDER_LOCK_KEY, handle_failure, send_queued_emails
+from .models import FailedEmail
+from .tokens import CachedRefreshToken, get_revoked_key, purge_expired_tokens
+from .utils import send_password_reset_email, verify_token
+from .throttling import TokenBucketThrottle
 
-# Create your tests here.
+try:
+    import fakeredis
+    import lupa  # noqa: F401
+except ImportError:
+    fakeredis = None
+
+
+class BucketThrottle(TokenBucketThrottle):
+    scope = 'test'
+    rate = '2/min'
+
+
+class ThrottledView(APIView):
+    authentication_classes = []
+    permission_classes = [AllowAny]
+    throttle_classes = [BucketThrottle]
+
+    def post(self, request):
+        return Response({})
+
+
+@skipUnless(fakeredis, 'fakeredis with lupa is required for the Lua token bucket')
+class TokenBucketThrottleTests(SimpleTestCase):
+    """Redis token buckets keyed by client IP and submitted email."""
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.now = 1000.0
+        patches = [
+            mock.patch('users.throttling.get_redis_connection', return_value=fakeredis.FakeRedis(server=self.server)),
+            mock.patch.object(BucketThrottle, 'timer', lambda throttle: self.now),
+        ]
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+
+    def post(self, ip='10.0.0.1', email=None):
+        data = {'email': email} if email else {}
+        request = APIRequestFactory().post('/', data, format='json', REMOTE_ADDR=ip)
+        return ThrottledView.as_view()(request)
+
+    def test_bucket_allows_capacity_then_rejects(self):
+        self.assertEqual([self.post().status_code for _ in range(3)], [200, 200, 429])
+
+    def test_rejection_sets_retry_after(self):
+        self.post()
+        self.post()
+        response = self.post()
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+
+    def test_bucket_refills_over_time(self):
+        self.post()
+        self.post()
+        self.now += 29
+        self.assertEqual(self.post().status_code, 429)
+        self.now += 1
+        self.assertEqual(self.post().status_code, 200)
+        self.assertEqual(self.post().status_code, 429)
+
+    def test_ip_limited_across_emails(self):
+        statuses = [self.post(email=f'user{i}@example.com').status_code for i in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_email_limited_across_ips(self):
+        statuses = [self.post(ip=f'10.0.0.{i}', email='User@Example.com ').status_code for i in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+    def test_rejected_request_does_not_drain_other_bucket(self):
+        self.post(ip='10.0.0.1', email='a@example.com')
+        self.post(ip='10.0.0.1', email='a@example.com')
+        self.assertEqual(self.post(ip='10.0.0.2', email='a@example.com').status_code, 429)
+        self.assertEqual(self.post(ip='10.0.0.2', email='b@example.com').status_code, 200)
+        self.assertEqual(self.post(ip='10.0.0.2', email='c@example.com').status_code, 200)
+
+    def test_fails_open_without_redis(self):
+        self.server.connected = False
+        self.assertEqual([self.post().status_code for _ in range(3)], [200, 200, 200])
+
+
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+
+@override_settings(CACHES=LOCAL_CACHES)
+class CachedUserTests(TestCase):
+    """Users cached between requests by the cookie authentication."""
+
+    def setUp(self):
+        self.user = User.objects.create_user('user@example.com', 'user@example.com', 'secret-123')
+        self.token = str(AccessToken.for_user(self.user))
+
+    def authenticate(self):
+        request = RequestFactory().get('/')
+        request.COOKIES['access_token'] = self.token
+        return CookieJWTAuthentication().authenticate(request)[0]
+
+    def test_cached_user_served_without_query(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = self.authenticate()
+        self.assertEqual(
+            (user.pk, user.username, user.email, user.is_active, user.is_staff, user.is_superuser),
+            (self.user.pk, 'user@example.com', 'user@example.com', True, False, False)
+        )
+        self.assertFalse(user._state.adding)
+
+    def test_async_lookup_served_from_cache(self):
+        self.authenticate()
+        with self.assertNumQueries(0):
+            user = async_to_sync(CookieJWTAuthentication().aget_user)(AccessToken(self.token))
+        self.assertEqual((user.email, user.is_superuser), ('user@example.com', False))
+
+    def test_deactivation_applies_to_next_request(self):
+        self.authenticate()
+        self.user.is_active = False
+        self.user.save()
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+    def test_deleted_user_dropped_from_cache(self):
+        self.authenticate()
+        user_id = self.user.pk
+        self.user.delete()
+        self.assertIsNone(cache.get(get_user_cache_key(user_id)))
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate()
+
+
+@skipUnless(fakeredis, 'fakeredis with lupa is required for the sender lock')
+@override_settings(CACHES=LOCAL_CACHES, EMAIL_MAX_ATTEMPTS=1)
+class QueuedEmailTests(TestCase):
+    """Sender lock and dead letters of queued email."""
+
+    def setUp(self):
+        self.redis = fakeredis.FakeRedis()
+        self.enterContext(mock.patch('users.emails.get_redis_connection', return_value=self.redis))
+        self.queue = self.enterContext(mock.patch('users.emails.django_rq.get_queue')).return_value
+        self.user = User.objects.create_user('user@example.com', 'user@example.com', 'secret-123')
+
+    def test_running_sender_not_waited_for(self):
+        send_password_reset_email(self.user, 'uid', 'token')
+        self.redis.lock(SENDER_LOCK_KEY, timeout=300).acquire()
+        with mock.patch('users.emails.send_batch') as send_batch:
+            send_queued_emails()
+        send_batch.assert_not_called()
+
+    def test_dead_letter_stores_no_link(self):
+        message = {'kind': 'password_reset', 'to': self.user.email, 'context': {'link': 'secret-link'},
+                   'attempts': 0, 'user_id': self.user.pk}
+        handle_failure(message, OSError('refused'))
+        failed = FailedEmail.objects.get()
+        self.assertEqual((failed.kind, failed.user, failed.error), ('password_reset', self.user, 'OSError: refused'))
+        self.assertNotIn('secret-link', str(FailedEmail.objects.values().get()))
+
+    def test_resend_generates_new_link(self):
+        FailedEmail.objects.create(kind='password_reset', recipient=self.user.email, user=self.user, attempts=1)
+        FailedEmail.objects.create(kind='activation', recipient='gone@example.com', attempts=1)
+        admin = FailedEmailAdmin(FailedEmail, site)
+        with mock.patch('users.utils.queue_email') as queue_email, mock.patch.object(admin, 'message_user'):
+            admin.resend(None, FailedEmail.objects.all())
+        kind, recipient, context = queue_email.call_args.args
+        self.assertEqual((kind, recipient), ('password_reset', self.user.email))
+        token = context['link'].rsplit('token=', 1)[1]
+        self.assertTrue(verify_token(self.user, token))
+        self.assertEqual(list(FailedEmail.objects.values_list('recipient', flat=True)), ['gone@example.com'])
+
+
+@skipUnless(fakeredis, 'fakeredis is required for Redis revocations')
+@override_settings(CACHES=LOCAL_CACHES, JWT_PURGE_BATCH_SIZE=2)
+class RefreshTokenTests(TestCase):
+    """Redis revocation checks and purging of expired token rows."""
+
+    def setUp(self):
+        self.server = fakeredis.FakeServer()
+        self.redis = fakeredis.FakeRedis(server=self.server)
+        self.enterContext(mock.patch('users.tokens.get_redis_connection', return_value=self.redis))
+        self.user = User.objects.create_user('user@example.com', 'user@example.com', 'secret-123')
+
+    def create_tokens(self, count, expired=False):
+        tokens = [CachedRefreshToken.for_user(self.user) for _ in range(count)]
+        if expired:
+            OutstandingToken.objects.filter(jti__in=[token['jti'] for token in tokens]).update(
+                expires_at=timezone.now() - timedelta(minutes=1)
+            )
+        return tokens
+
+    def test_revoked_token_rejected_without_query(self):
+        token = self.create_tokens(1)[0]
+        token.blacklist()
+        with self.assertNumQueries(0), self.assertRaises(TokenError):
+            CachedRefreshToken(str(token))
+
+    def test_valid_token_accepted_without_query(self):
+        token = self.create_tokens(1)[0]
+        with self.assertNumQueries(0):
+            CachedRefreshToken(str(token))
+
+    def test_blacklist_table_checked_when_redis_fails(self):
+        revoked, valid = self.create_tokens(2)
+        revoked.blacklist()
+        self.server.connected = False
+        with self.assertRaises(TokenError):
+            CachedRefreshToken(str(revoked))
+        CachedRefreshToken(str(valid))
+
+    def test_expired_rows_deleted_in_batches(self):
+        expired = self.create_tokens(5, expired=True)
+        current = self.create_tokens(2)
+        for token in [expired[0], current[0]]:
+            BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token['jti']))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(purge_expired_tokens(), 5)
+        deletes = [query for query in queries if query['sql'].startswith('DELETE FROM "token_blacklist_outstanding')]
+        self.assertEqual(len(deletes), 3)
+        self.assertEqual(
+            set(OutstandingToken.objects.values_list('jti', flat=True)), {token['jti'] for token in current}
+        )
+        self.assertEqual(list(BlacklistedToken.objects.values_list('token__jti', flat=True)), [current[0]['jti']])
+
+    def test_purge_restores_lost_revocations(self):
+        token = self.create_tokens(1)[0]
+        BlacklistedToken.objects.create(token=OutstandingToken.objects.get(jti=token['jti']))
+        purge_expired_tokens()
+        ttl = self.redis.ttl(get_revoked_key(token['jti']))
+        self.assertAlmostEqual(ttl, token['exp'] - time.time(), delta=5)
+        with self.assertRaises(TokenError):
+            CachedRefreshToken(str(token))
@@ -0,0 +1,102 @@
+"""Redis token-bucket throttles for CPU-heavy authentication endpoints."""
+import hashlib
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework.throttling import SimpleRateThrottle
+from core.metrics import THROTTLED_REQUESTS
+
+TOKEN_BUCKET_SCRIPT = '''
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local now = tonumber(ARGV[3])
+local levels = {}
+for i, key in ipairs(KEYS) do
+    local bucket = redis.call('HMGET', key, 'tokens', 'ts')
+    local tokens = tonumber(bucket[1]) or capacity
+    local elapsed = math.max(0, now - (tonumber(bucket[2]) or now))
+    tokens = math.min(capacity, tokens + elapsed * rate)
+    if tokens < 1 then
+        return {0, math.ceil((1 - tokens) / rate), i}
+    end
+    levels[i] = tokens
+end
+local ttl = math.ceil(capacity / rate)
+for i, key in ipairs(KEYS) do
+    redis.call('HSET', key, 'tokens', tostring(levels[i] - 1), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, ttl)
+end
+return {1, 0, 0}
+'''
+
+
+def get_token_bucket_script():
+    """Return the Lua script, invoked by EVALSHA and loaded only if Redis lacks it."""
+    return get_redis_connection('default').register_script(TOKEN_BUCKET_SCRIPT)
+
+
+class TokenBucketThrottle(SimpleRateThrottle):
+    """Token bucket per client IP and submitted email, checked in one Redis round trip."""
+
+    def __init__(self):
+        super().__init__()
+        self.wait_seconds = None
+
+    def get_cache_key(self, request, view):
+        """Return Redis key of the client IP bucket."""
+        return f'throttle:{self.scope}:ip:{self.get_ident(request)}'
+
+    def get_bucket_keys(self, request, view):
+        """Return (key type, Redis key) pairs of every bucket the request draws from."""
+        keys = [('ip', self.get_cache_key(request, view))]
+        email = request.data.get('email') if hasattr(request.data, 'get') else None
+        if isinstance(email, str) and email:
+            digest = hashlib.sha256(email.strip().lower().encode()).hexdigest()[:32]
+            keys.append(('email', f'throttle:{self.scope}:email:{digest}'))
+        return keys
+
+    def allow_request(self, request, view):
+        """Take one token from every bucket of the request, allowing it if Redis is unavailable."""
+        if self.rate is None:
+            return True
+        keys = self.get_bucket_keys(request, view)
+        rate = self.num_requests / (self.duration * 1000)
+        now = int(self.timer() * 1000)
+        try:
+            allowed, wait_ms, index = get_token_bucket_script()(
+                keys=[key for _, key in keys], args=[self.num_requests, rate, now]
+            )
+        except RedisError:
+            return True
+        if allowed:
+            return True
+        THROTTLED_REQUESTS.labels(self.scope, keys[index - 1][0]).inc()
+        self.wait_seconds = wait_ms / 1000
+        return False
+
+    def wait(self):
+        """Return seconds until the exhausted bucket holds a token again."""
+        return self.wait_seconds
+
+
+class LoginThrottle(TokenBucketThrottle):
+    """Limit login attempts."""
+
+    scope = 'login'
+
+
+class RegisterThrottle(TokenBucketThrottle):
+    """Limit account registrations."""
+
+    scope = 'register'
+
+
+class PasswordResetThrottle(TokenBucketThrottle):
+    """Limit password reset requests."""
+
+    scope = 'password_reset'
+
+
+class TokenRefreshThrottle(TokenBucketThrottle):
+    """Limit access token refreshes."""
+
+    scope = 'token_refresh'
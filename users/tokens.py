@@ -0,0 +1,74 @@
+"""Refresh tokens with a Redis revocation check and pruning of expired token rows."""
+import time
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from django_redis import get_redis_connection
+from redis.exceptions import RedisError
+from rest_framework_simplejwt.exceptions import TokenError
+from rest_framework_simplejwt.settings import api_settings
+from rest_framework_simplejwt.token_blacklist.models import BlacklistedToken, OutstandingToken
+from rest_framework_simplejwt.tokens import RefreshToken
+
+
+def get_revoked_key(jti):
+    """Return Redis key marking a token id as revoked."""
+    return f'jwt:revoked:{jti}'
+
+
+def revoke_jti(jti, expires, connection=None):
+    """Mark a token id revoked in Redis until the token expires anyway."""
+    ttl = int(expires - time.time())
+    if ttl > 0:
+        (connection or get_redis_connection('default')).set(get_revoked_key(jti), 1, ex=ttl)
+
+
+class CachedRefreshToken(RefreshToken):
+    """Refresh token whose blacklist check is a Redis lookup instead of a table query."""
+
+    def check_blacklist(self):
+        """Raise TokenError if the token is revoked in Redis, asking the blacklist table if Redis fails."""
+        jti = self.payload[api_settings.JTI_CLAIM]
+        try:
+            revoked = get_redis_connection('default').exists(get_revoked_key(jti))
+        except RedisError:
+            return super().check_blacklist()
+        if revoked:
+            raise TokenError(_('Token is blacklisted'))
+
+    def blacklist(self):
+        """Revoke token in Redis and record it in the blacklist table."""
+        revoke_jti(self.payload[api_settings.JTI_CLAIM], self.payload['exp'])
+        return super().blacklist()
+
+
+def purge_expired_tokens():
+    """Delete expired outstanding and blacklisted tokens in batches, then resync revocations."""
+    now = timezone.now()
+    deleted = 0
+    while True:
+        ids = list(OutstandingToken.objects.filter(expires_at__lte=now).order_by('pk').values_list(
+            'pk', flat=True
+        )[:settings.JWT_PURGE_BATCH_SIZE])
+        if not ids:
+            break
+        with transaction.atomic():
+            BlacklistedToken.objects.filter(token_id__in=ids).delete()
+            OutstandingToken.objects.filter(pk__in=ids).delete()
+        deleted += len(ids)
+    sync_revocations(now)
+    return deleted
+
+
+def sync_revocations(now):
+    """Copy unexpired blacklist entries to Redis, restoring revocations lost with Redis data."""
+    rows = BlacklistedToken.objects.filter(token__expires_at__gt=now).values_list(
+        'token__jti', 'token__expires_at'
+    )
+    pipe = get_redis_connection('default').pipeline(transaction=False)
+    for i, (jti, expires_at) in enumerate(rows.iterator(chunk_size=settings.JWT_PURGE_BATCH_SIZE), start=1):
+        revoke_jti(jti, expires_at.timestamp(), pipe)
+        if i % settings.JWT_PURGE_BATCH_SIZE == 0:
+            pipe.execute()
+    pipe.execute()
@@ -1,15 +1,16 @@
 """Views for user authentication endpoints."""
 from rest_framework import status
-from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.decorators import api_view, permission_classes, authentication_classes, throttle_classes
 from rest_framework.permissions import AllowAny
 from rest_framework.response import Response
-from rest_framework_simplejwt.tokens import RefreshToken
 from django.contrib.auth import authenticate
 from django.contrib.auth.models import User
 from .serializers import (
     RegisterSerializer, LoginSerializer,
     PasswordResetSerializer, PasswordConfirmSerializer
 )
+from .throttling import LoginThrottle, PasswordResetThrottle, RegisterThrottle, TokenRefreshThrottle
+from .tokens import CachedRefreshToken
 from .utils import (
     generate_token_data, send_activation_email, send_password_reset_email,
     set_auth_cookies, delete_auth_cookies, get_user_from_uidb64,
@@ -20,6 +21,7 @@ from .utils import (
 @api_view(['POST'])
 @authentication_classes([])
 @permission_classes([AllowAny])
+@throttle_classes([RegisterThrottle])
 def register_view(request):
     """Register new user and send activation email."""
     serializer = RegisterSerializer(data=request.data)
@@ -52,6 +54,7 @@ def activate_view(request, uidb64, token):
 @api_view(['POST'])
 @authentication_classes([])
 @permission_classes([AllowAny])
+@throttle_classes([LoginThrottle])
 def login_view(request):
     """Authenticate user and set JWT cookies."""
     serializer = LoginSerializer(data=request.data)
@@ -63,7 +66,7 @@ def login_view(request):
     )
     if not user or not user.is_active:
         return Response({'detail': 'Invalid credentials.'}, status=status.HTTP_401_UNAUTHORIZED)
-    refresh = RefreshToken.for_user(user)
+    refresh = CachedRefreshToken.for_user(user)
     response = Response(
         {'detail': 'Login successful', 'user': {'id': user.id, 'username': user.email}},
         status=status.HTTP_200_OK
@@ -90,13 +93,14 @@ def logout_view(request):
 @api_view(['POST'])
 @authentication_classes([])
 @permission_classes([AllowAny])
+@throttle_classes([TokenRefreshThrottle])
 def token_refresh_view(request):
     """Refresh access token using refresh token cookie."""
     refresh_token = request.COOKIES.get('refresh_token')
     if not refresh_token:
         return Response({'detail': 'Refresh token missing.'}, status=status.HTTP_400_BAD_REQUEST)
     try:
-        token = RefreshToken(refresh_token)
+        token = CachedRefreshToken(refresh_token)
         response = Response(
             {'detail': 'Token refreshed', 'access': str(token.access_token)},
             status=status.HTTP_200_OK
@@ -113,6 +117,7 @@ def token_refresh_view(request):
 @api_view(['POST'])
 @authentication_classes([])
 @permission_classes([AllowAny])
+@throttle_classes([PasswordResetThrottle])
 def password_reset_view(request):
     """Send password reset email."""
     serializer = PasswordResetSerializer(data=request.data)
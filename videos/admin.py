@@ -1,13 +1,38 @@
 """Admin configuration for video models."""
 from django.contrib import admin
-from .models import Video
+from .models import Upload, Video, VideoRendition
 
 
 @admin.register(Video)
 class VideoAdmin(admin.ModelAdmin):
     """Admin interface for Video model."""
 
-    list_display = ['title', 'category', 'created_at']
-    list_filter = ['category', 'created_at']
+    list_display = ['title', 'category', 'status', 'created_at', 'hls_completed_at']
+    list_filter = ['status', 'category', 'created_at']
     search_fields = ['title', 'description']
-    readonly_fields = ['created_at']
+    readonly_fields = [
+        'created_at', 'status', 'progress', 'error', 'timings', 'hls_completed_at', 'content_hash',
+        'width', 'height', 'duration', 'fps', 'video_codec', 'audio_codec',
+        'pix_fmt', 'profile', 'keyframe_interval', 'bitrate',
+    ]
+
+
+@admin.register(VideoRendition)
+class VideoRenditionAdmin(admin.ModelAdmin):
+    """Admin interface for VideoRendition model."""
+
+    list_display = [
+        'video', 'resolution', 'status', 'progress', 'encode_speed', 'encode_seconds', 'size_bytes', 'updated_at'
+    ]
+    list_filter = ['status', 'resolution']
+    readonly_fields = [
+        'checksum', 'progress', 'encode_speed', 'started_at', 'finished_at', 'encode_seconds', 'size_bytes', 'updated_at'
+    ]
+
+
+@admin.register(Upload)
+class UploadAdmin(admin.ModelAdmin):
+    """Admin interface for Upload model."""
+
+    list_display = ['filename', 'offset', 'size', 'video', 'created_at']
+    readonly_fields = ['id', 'file_path', 'size', 'offset', 'sha256', 'created_at', 'updated_at']
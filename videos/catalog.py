@@ -0,0 +1,131 @@
+"""Versioned, prebuilt video catalog cache."""
+import hashlib
+from datetime import timezone as dt_timezone
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Exists, OuterRef, Q
+from django.utils import timezone
+from django.utils.encoding import filepath_to_uri
+from redis.exceptions import LockError
+import django_rq
+import orjson
+from core.metrics import CACHE_LOOKUPS
+from .queues import LIGHT
+
+CATALOG_VERSION_KEY = 'catalog:version'
+CATALOG_BASES_KEY = 'catalog:bases'
+CATALOG_LOCK_KEY = 'catalog:lock'
+CATALOG_FIELDS = ['id', 'created_at', 'title', 'description', 'thumbnail', 'category']
+
+
+def get_entry_key(base_url):
+    """Return cache key of the catalog built for one base URL."""
+    return f'catalog:data:{base_url}'
+
+
+def get_playable_videos():
+    """Return ready videos, plus encoding ones with output when progressive."""
+    from .models import Video, VideoRendition
+    playable = Q(status='ready')
+    if settings.HLS_PROGRESSIVE:
+        started = VideoRendition.objects.filter(video=OuterRef('pk'), progress__gt=0)
+        playable |= Q(status='encoding') & Exists(started)
+    return Video.objects.filter(playable)
+
+
+def build_catalog(base_url):
+    """Serialize all playable videos to JSON bytes with absolute thumbnail URLs."""
+    rows = get_playable_videos().values_list(*CATALOG_FIELDS)
+    return render_catalog(rows, get_thumbnail_prefix(base_url))
+
+
+def get_thumbnail_prefix(base_url):
+    """Return absolute URL prefix of stored thumbnails."""
+    from .models import Video
+    return base_url + Video._meta.get_field('thumbnail').storage.url('')
+
+
+def format_datetime(value, tz):
+    """Format datetime exactly like DRF's DateTimeField, naive when tz is None."""
+    if tz is None:
+        value = timezone.make_naive(value, dt_timezone.utc) if timezone.is_aware(value) else value
+    elif timezone.is_aware(value):
+        value = value.astimezone(tz)
+    else:
+        value = timezone.make_aware(value, tz)
+    value = value.isoformat()
+    return value[:-6] + 'Z' if value.endswith('+00:00') else value
+
+
+def render_catalog(rows, thumbnail_prefix):
+    """Render catalog rows to the same bytes as VideoSerializer with JSONRenderer."""
+    tz = timezone.get_current_timezone() if settings.USE_TZ else None
+    data = [
+        {
+            'id': pk,
+            'created_at': format_datetime(created_at, tz),
+            'title': title,
+            'description': description,
+            'thumbnail_url': thumbnail_prefix + filepath_to_uri(thumbnail).lstrip('/') if thumbnail else None,
+            'category': category,
+        }
+        for pk, created_at, title, description, thumbnail, category in rows
+    ]
+    return orjson.dumps(data).replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+def read_catalog(base_url):
+    """Return current version and cached entry if it matches that version."""
+    values = cache.get_many([CATALOG_VERSION_KEY, get_entry_key(base_url)])
+    version = values.get(CATALOG_VERSION_KEY, 0)
+    entry = values.get(get_entry_key(base_url))
+    if entry and entry['version'] == version:
+        return version, entry
+    return version, None
+
+
+def make_entry(base_url, version):
+    """Build catalog entry with body bytes and content-derived ETag."""
+    body = build_catalog(base_url)
+    return {'version': version, 'etag': f'"{hashlib.md5(body).hexdigest()}"', 'body': body}
+
+
+def rebuild_catalog(base_url, version):
+    """Build catalog bytes and store them under the given version."""
+    entry = make_entry(base_url, version)
+    cache.set(get_entry_key(base_url), entry, None)
+    bases = cache.get(CATALOG_BASES_KEY, set())
+    if base_url not in bases:
+        cache.set(CATALOG_BASES_KEY, bases | {base_url}, None)
+    return entry
+
+
+def get_catalog(base_url):
+    """Return cached catalog entry, letting only one worker rebuild a miss."""
+    version, entry = read_catalog(base_url)
+    if entry:
+        CACHE_LOOKUPS.labels('catalog', 'hit').inc()
+        return entry
+    CACHE_LOOKUPS.labels('catalog', 'miss').inc()
+    try:
+        with cache.lock(CATALOG_LOCK_KEY, timeout=60, blocking_timeout=10):
+            version, entry = read_catalog(base_url)
+            return entry or rebuild_catalog(base_url, version)
+    except LockError:
+        return make_entry(base_url, version)
+
+
+def invalidate_catalog():
+    """Bump catalog version and rebuild known variants in the background."""
+    try:
+        cache.incr(CATALOG_VERSION_KEY)
+    except ValueError:
+        cache.set(CATALOG_VERSION_KEY, 1, None)
+    queue = django_rq.get_queue(LIGHT, autocommit=True)
+    queue.enqueue('videos.catalog.refresh_catalog')
+
+
+def refresh_catalog():
+    """Rebuild catalog entries for every base URL seen so far."""
+    for base_url in cache.get(CATALOG_BASES_KEY, set()):
+        get_catalog(base_url)
@@ -0,0 +1,141 @@
+"""Chunked HLS encoding for long videos."""
+import csv
+import math
+import os
+import shutil
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from .progress import run_ffmpeg
+
+MIN_SEGMENT_SECONDS = 1.0
+
+
+def use_chunked_encoding(probe):
+    """Return True if source is long enough for chunked encoding."""
+    if not settings.HLS_CHUNK_SECONDS:
+        return False
+    return (probe.get('duration') or 0) >= settings.HLS_CHUNK_MIN_DURATION
+
+
+def convert_chunked(source_path, output_base, resolutions, probe, on_progress=None):
+    """Encode source in keyframe-aligned chunks and stitch the results."""
+    work_dir = os.path.join(output_base, '.chunks-' + '-'.join(resolutions))
+    shutil.rmtree(work_dir, ignore_errors=True)
+    chunks = split_source(source_path, work_dir)
+    playlists = {resolution: [] for resolution in resolutions}
+    started = time.monotonic()
+    for i in encode_chunks(chunks, work_dir, resolutions, probe):
+        for resolution, entries in playlists.items():
+            stitch_chunk(os.path.join(work_dir, str(i), resolution), output_base, resolution, entries)
+            if settings.HLS_PROGRESSIVE:
+                write_playlist(os.path.join(output_base, resolution, 'index.m3u8'), entries, ended=False)
+        if on_progress:
+            encoded = sum(duration for duration, _, _ in playlists[resolutions[0]])
+            on_progress(encoded, round(encoded / (time.monotonic() - started), 3))
+    for resolution, entries in playlists.items():
+        write_playlist(os.path.join(output_base, resolution, 'index.m3u8'), entries)
+    shutil.rmtree(work_dir)
+
+
+def split_source(source_path, work_dir):
+    """Split source at keyframes into chunks and return (path, start) pairs."""
+    os.makedirs(work_dir)
+    list_path = os.path.join(work_dir, 'chunks.csv')
+    cmd = build_split_command(source_path, work_dir, list_path)
+    run_ffmpeg(cmd)
+    with open(list_path, newline='') as handle:
+        rows = list(csv.reader(handle))
+    return [(os.path.join(work_dir, row[0]), float(row[1])) for row in rows]
+
+
+def build_split_command(source, work_dir, list_path):
+    """Build FFMPEG command that stream-copies source into chunks."""
+    return [
+        'ffmpeg', '-i', source,
+        '-map', '0:v:0', '-map', '0:a?',
+        '-c', 'copy',
+        '-f', 'segment',
+        '-segment_time', str(settings.HLS_CHUNK_SECONDS),
+        '-reset_timestamps', '1',
+        '-segment_list', list_path,
+        '-segment_list_type', 'csv',
+        os.path.join(work_dir, 'chunk%05d.mkv')
+    ]
+
+
+def encode_chunks(chunks, work_dir, resolutions, probe):
+    """Encode chunks in parallel FFMPEG processes, yielding indexes in order."""
+    with ThreadPoolExecutor(max_workers=settings.HLS_CHUNK_WORKERS) as pool:
+        futures = [
+            pool.submit(encode_chunk, path, os.path.join(work_dir, str(i)), resolutions, probe, start)
+            for i, (path, start) in enumerate(chunks)
+        ]
+        for i, future in enumerate(futures):
+            future.result()
+            yield i
+
+
+def encode_chunk(chunk_path, chunk_dir, resolutions, probe, offset):
+    """Encode one chunk with timestamps shifted to its source position."""
+    from .tasks import build_multi_ffmpeg_command
+    for resolution in resolutions:
+        os.makedirs(os.path.join(chunk_dir, resolution), exist_ok=True)
+    cmd = build_multi_ffmpeg_command(
+        chunk_path, chunk_dir, resolutions, probe, offset, settings.HLS_CHUNK_WORKERS
+    )
+    run_ffmpeg(cmd)
+
+
+def read_playlist_entries(playlist_path):
+    """Return (duration, segment) pairs from an HLS media playlist."""
+    entries = []
+    duration = None
+    with open(playlist_path) as handle:
+        for line in handle:
+            line = line.strip()
+            if line.startswith('#EXTINF:'):
+                duration = float(line[8:].split(',')[0])
+            elif line and not line.startswith('#'):
+                entries.append((duration, line))
+    return entries
+
+
+def stitch_chunk(chunk_dir, output_base, resolution, entries):
+    """Move one chunk's segments into the numbered output, flagging where TS counters restart."""
+    output_dir = os.path.join(output_base, resolution)
+    os.makedirs(output_dir, exist_ok=True)
+    chunk_entries = read_playlist_entries(os.path.join(chunk_dir, 'index.m3u8'))
+    for position, (duration, segment) in enumerate(chunk_entries):
+        source = os.path.join(chunk_dir, segment)
+        if position and duration < MIN_SEGMENT_SECONDS:
+            entries[-1] = append_segment(output_dir, entries[-1], source, duration)
+            continue
+        name = f'index{len(entries)}.ts'
+        os.replace(source, os.path.join(output_dir, name))
+        entries.append((duration, name, position == 0 and bool(entries)))
+
+
+def append_segment(output_dir, entry, source, duration):
+    """Append a short chunk tail to the previous MPEG-TS segment."""
+    with open(os.path.join(output_dir, entry[1]), 'ab') as target, open(source, 'rb') as tail:
+        shutil.copyfileobj(tail, target)
+    return entry[0] + duration, entry[1], entry[2]
+
+
+def write_playlist(playlist_path, entries, ended=True):
+    """Atomically write a media playlist, as EVENT while still growing."""
+    target = math.ceil(max((duration for duration, _, _ in entries), default=0))
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', f'#EXT-X-TARGETDURATION:{target}', '#EXT-X-MEDIA-SEQUENCE:0']
+    if settings.HLS_PROGRESSIVE:
+        lines.append('#EXT-X-PLAYLIST-TYPE:EVENT')
+    for duration, name, discontinuity in entries:
+        if discontinuity:
+            lines.append('#EXT-X-DISCONTINUITY')
+        lines += [f'#EXTINF:{duration:.6f},', name]
+    if ended:
+        lines.append('#EXT-X-ENDLIST')
+    temp_path = playlist_path + '.tmp'
+    with open(temp_path, 'w') as handle:
+        handle.write('\n'.join(lines) + '\n')
+    os.replace(temp_path, playlist_path)
@@ -0,0 +1,48 @@
+"""Content hashing and reuse of HLS output between identical sources."""
+import errno
+import hashlib
+import os
+import shutil
+
+BLOCK_SIZE = 1024 * 1024
+
+
+def hash_file(path):
+    """Return SHA-256 hex digest of a file."""
+    hasher = hashlib.sha256()
+    with open(path, 'rb') as handle:
+        for block in iter(lambda: handle.read(BLOCK_SIZE), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def get_rendition_checksum(output_dir):
+    """Return SHA-256 over names and contents of a rendition's files, or '' if missing."""
+    if not os.path.isfile(os.path.join(output_dir, 'index.m3u8')):
+        return ''
+    hasher = hashlib.sha256()
+    for name in sorted(os.listdir(output_dir)):
+        path = os.path.join(output_dir, name)
+        if not os.path.isfile(path) or name.endswith('.tmp'):
+            continue
+        hasher.update(name.encode() + b'\0')
+        with open(path, 'rb') as handle:
+            for block in iter(lambda: handle.read(BLOCK_SIZE), b''):
+                hasher.update(block)
+    return hasher.hexdigest()
+
+
+def link_rendition(source_dir, target_dir):
+    """Hard-link a rendition's files into target, copying across filesystems."""
+    shutil.rmtree(target_dir, ignore_errors=True)
+    os.makedirs(target_dir)
+    for name in os.listdir(source_dir):
+        source = os.path.join(source_dir, name)
+        if not os.path.isfile(source):
+            continue
+        try:
+            os.link(source, os.path.join(target_dir, name))
+        except OSError as error:
+            if error.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                raise
+            shutil.copy2(source, os.path.join(target_dir, name))
@@ -0,0 +1,235 @@
+"""HTTP API load and latency benchmark replaying viewer sessions."""
+import math
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urljoin
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from redis import Redis
+from redis.client import Pipeline
+from videos.models import Video
+
+BENCH_SETTINGS = 'core.settings_bench'
+PASSWORD = 'bench-Password-1'
+RESOLUTION = '480p'
+REQUEST_TYPES = ['login', 'refresh', 'list', 'manifest', 'segment']
+
+counters = threading.local()
+
+
+class Command(BaseCommand):
+    """Run concurrent viewer sessions against the API in-process and report latencies."""
+
+    help = 'Benchmark login, refresh, list, manifest and segment requests with concurrent clients.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--clients', type=int, default=8, help='Concurrent client threads.')
+        parser.add_argument('--sessions', type=int, default=40, help='Viewer sessions in total.')
+        parser.add_argument('--segments', type=int, default=20, help='Segments fetched per session.')
+        parser.add_argument('--videos', type=int, default=50)
+        parser.add_argument('--segment-kb', type=int, default=512)
+        parser.add_argument('--seed', type=int, default=1)
+
+    def handle(self, *args, **options):
+        if settings.SETTINGS_MODULE != BENCH_SETTINGS:
+            raise CommandError(f'Run with --settings={BENCH_SETTINGS}; fixtures replace all videos.')
+        call_command('migrate', verbosity=0)
+        users = create_users(options['clients'])
+        video_ids = create_videos(options['videos'], options['segments'], options['segment_kb'])
+        stats = Stats()
+        sessions = [
+            Session(stats, users[i % len(users)], video_ids, options['segments'], options['seed'] + i)
+            for i in range(options['sessions'])
+        ]
+        with count_redis_calls():
+            started = time.perf_counter()
+            with ThreadPoolExecutor(max_workers=options['clients']) as pool:
+                list(pool.map(Session.run, sessions))
+            elapsed = time.perf_counter() - started
+        self.stdout.write(stats.format(elapsed))
+
+
+class Stats:
+    """Thread-safe collection of per request type measurements."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = {kind: [] for kind in REQUEST_TYPES}
+        self.queries = dict.fromkeys(REQUEST_TYPES, 0)
+        self.redis_calls = dict.fromkeys(REQUEST_TYPES, 0)
+        self.errors = dict.fromkeys(REQUEST_TYPES, 0)
+
+    def record(self, kind, seconds, queries, redis_calls, status_code):
+        """Store one request measurement."""
+        with self.lock:
+            self.samples[kind].append(seconds)
+            self.queries[kind] += queries
+            self.redis_calls[kind] += redis_calls
+            self.errors[kind] += status_code >= 400
+
+    def format(self, elapsed):
+        """Return report table of latencies, throughput, queries and Redis calls."""
+        lines = [
+            f'{"type":<9}{"count":>7}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}{"p99 ms":>9}'
+            f'{"db/req":>8}{"redis/req":>10}{"errors":>8}'
+        ]
+        total = 0
+        for kind in REQUEST_TYPES:
+            samples = sorted(self.samples[kind])
+            count = len(samples)
+            total += count
+            if not count:
+                continue
+            lines.append(
+                f'{kind:<9}{count:>7}{count / elapsed:>9.1f}'
+                f'{percentile(samples, 50) * 1000:>9.1f}{percentile(samples, 95) * 1000:>9.1f}'
+                f'{percentile(samples, 99) * 1000:>9.1f}{self.queries[kind] / count:>8.2f}'
+                f'{self.redis_calls[kind] / count:>10.2f}{self.errors[kind]:>8}'
+            )
+        lines.append(f'{total} requests in {elapsed:.2f}s, {total / elapsed:.1f} req/s')
+        return '\n'.join(lines)
+
+
+class Session:
+    """One viewer: login, list, manifest, a stream of segments and a token refresh."""
+
+    def __init__(self, stats, email, video_ids, segments, seed):
+        self.stats = stats
+        self.email = email
+        self.video_ids = video_ids
+        self.segments = segments
+        self.random = random.Random(seed)
+        self.client = Client()
+
+    def run(self):
+        """Replay the session, counting queries on this thread's connection."""
+        try:
+            with connection.execute_wrapper(count_query):
+                self.replay()
+        finally:
+            connection.close()
+
+    def replay(self):
+        """Issue the session's requests in player order."""
+        self.request('login', 'post', '/api/login/', {'email': self.email, 'password': PASSWORD})
+        self.request('list', 'get', '/api/video/')
+        video_id = self.random.choice(self.video_ids)
+        manifest_url = f'/api/video/{video_id}/{RESOLUTION}/index.m3u8'
+        manifest = self.request('manifest', 'get', manifest_url)
+        uris = get_segment_urls(manifest_url, manifest)[:self.segments]
+        for i, url in enumerate(uris):
+            if i == len(uris) // 2:
+                self.request('refresh', 'post', '/api/token/refresh/')
+            self.request('segment', 'get', url)
+
+    def request(self, kind, method, path, data=None):
+        """Send one request, read its full body and record measurements."""
+        counters.queries = counters.redis_calls = 0
+        started = time.perf_counter()
+        if method == 'post':
+            response = self.client.post(path, data or {}, content_type='application/json')
+        else:
+            response = self.client.get(path)
+        body = read_body(response)
+        elapsed = time.perf_counter() - started
+        self.stats.record(kind, elapsed, counters.queries, counters.redis_calls, response.status_code)
+        return body
+
+
+def count_query(execute, sql, params, many, context):
+    """Count database queries of the current thread."""
+    counters.queries = getattr(counters, 'queries', 0) + 1
+    return execute(sql, params, many, context)
+
+
+class count_redis_calls:
+    """Count Redis round trips of the current thread while active."""
+
+    def __enter__(self):
+        self.execute_command = Redis.execute_command
+        self.execute_pipeline = Pipeline.execute
+        Redis.execute_command = counted(self.execute_command)
+        Pipeline.execute = counted(self.execute_pipeline)
+
+    def __exit__(self, *exc_info):
+        Redis.execute_command = self.execute_command
+        Pipeline.execute = self.execute_pipeline
+
+
+def counted(method):
+    """Wrap a Redis client method so each call increments the thread counter."""
+    def wrapper(*args, **kwargs):
+        counters.redis_calls = getattr(counters, 'redis_calls', 0) + 1
+        return method(*args, **kwargs)
+    return wrapper
+
+
+def read_body(response):
+    """Return response body, consuming streamed file responses."""
+    if response.streaming:
+        body = b''.join(response.streaming_content)
+        response.close()
+        return body
+    return response.content
+
+
+def get_segment_urls(manifest_url, manifest):
+    """Resolve segment URIs of a media playlist like a player would."""
+    urls = []
+    for line in manifest.decode().splitlines():
+        if line and not line.startswith('#'):
+            urls.append(urljoin(manifest_url, line) if '?' in line else urljoin(manifest_url, f'{line}/'))
+    return urls
+
+
+def percentile(samples, percent):
+    """Return nearest-rank percentile of sorted samples."""
+    return samples[max(0, math.ceil(percent / 100 * len(samples)) - 1)]
+
+
+def create_users(count):
+    """Create active benchmark users once and return their emails."""
+    User = get_user_model()
+    emails = [f'bench{i}@example.com' for i in range(count)]
+    existing = set(User.objects.filter(email__in=emails).values_list('email', flat=True))
+    for email in emails:
+        if email not in existing:
+            User.objects.create_user(username=email, email=email, password=PASSWORD)
+    return emails
+
+
+def create_videos(count, segments, segment_kb):
+    """Replace all videos with ready fixtures and write their HLS files."""
+    Video.objects.all().delete()
+    Video.objects.bulk_create([
+        Video(
+            title=f'Benchmark {i}', description='Benchmark video', category='drama', status='ready',
+            video_file='videos/benchmark.mp4', thumbnail='thumbnails/benchmark.jpg',
+        )
+        for i in range(count)
+    ])
+    video_ids = list(Video.objects.values_list('pk', flat=True))
+    segment = b'\x47' * (segment_kb * 1024)
+    for pk in video_ids:
+        write_hls_fixture(os.path.join(settings.MEDIA_ROOT, 'hls', str(pk), RESOLUTION), segments, segment)
+    return video_ids
+
+
+def write_hls_fixture(output_dir, segments, segment):
+    """Write a VOD playlist with identical segments."""
+    os.makedirs(output_dir, exist_ok=True)
+    lines = ['#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:10', '#EXT-X-MEDIA-SEQUENCE:0']
+    for i in range(segments):
+        lines += ['#EXTINF:10.000000,', f'index{i}.ts']
+        with open(os.path.join(output_dir, f'index{i}.ts'), 'wb') as handle:
+            handle.write(segment)
+    lines.append('#EXT-X-ENDLIST')
+    with open(os.path.join(output_dir, 'index.m3u8'), 'w') as handle:
+        handle.write('\n'.join(lines) + '\n')
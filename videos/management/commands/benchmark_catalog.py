@@ -0,0 +1,72 @@
+"""Compare serializer and fast path catalog rendering."""
+import time
+from datetime import timedelta
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from videos.catalog import render_catalog
+from videos.models import Video
+from videos.serializers import VideoSerializer
+
+BASE_URL = 'http://testserver'
+
+
+class Command(BaseCommand):
+    """Time both catalog rendering paths on in-memory rows."""
+
+    help = 'Benchmark VideoSerializer against the values() catalog fast path.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+        parser.add_argument('--repeat', type=int, default=3)
+
+    def handle(self, *args, **options):
+        for size in options['sizes']:
+            videos = build_videos(size)
+            rows = [to_row(video) for video in videos]
+            slow, slow_body = best_of(options['repeat'], render_serializer, videos)
+            fast, fast_body = best_of(options['repeat'], render_catalog, rows, BASE_URL + '/media/')
+            if slow_body != fast_body:
+                raise CommandError(f'Output differs at {size} rows.')
+            self.stdout.write(
+                f'{size:>7} rows  serializer {slow * 1000:9.1f} ms  '
+                f'fast path {fast * 1000:8.1f} ms  speedup {slow / fast:5.1f}x'
+            )
+
+
+def build_videos(size):
+    """Return unsaved videos with varied text and thumbnails."""
+    now = timezone.now()
+    return [
+        Video(
+            id=i + 1,
+            created_at=now - timedelta(seconds=i, microseconds=i % 7),
+            title=f'Video {i} – "Überraschung"',
+            description='Lorem ipsum dolor sit amet ' * (i % 5),
+            thumbnail=f'thumbnails/thumb {i}.jpg' if i % 10 else '',
+            category='drama',
+        )
+        for i in range(size)
+    ]
+
+
+def to_row(video):
+    """Return the values_list() row of a video."""
+    return (video.id, video.created_at, video.title, video.description, video.thumbnail.name, video.category)
+
+
+def render_serializer(videos):
+    """Render videos through VideoSerializer and JSONRenderer."""
+    serializer = VideoSerializer(videos, many=True, context={'base_url': BASE_URL})
+    return JSONRenderer().render(serializer.data)
+
+
+def best_of(repeat, func, *args):
+    """Return fastest duration and result of repeated calls."""
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(*args)
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
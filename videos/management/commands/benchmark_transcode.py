@@ -0,0 +1,194 @@
+"""Reproducible HLS transcoding benchmark on synthetic sources."""
+import json
+import os
+import platform
+import shutil
+import subprocess
+import tempfile
+import time
+import traceback
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from videos.probe import probe_source
+from videos.tasks import build_ladder, encode_renditions
+
+DEFAULT_SOURCES = ['480:10', '720:10', '1080:10', '720:30']
+FRAME_RATE = 25
+
+ENGINES = {
+    'single_pass': {'HLS_SINGLE_PASS': True, 'HLS_PROGRESSIVE': False, 'HLS_CHUNK_SECONDS': 0},
+    'per_rendition': {'HLS_SINGLE_PASS': False, 'HLS_PROGRESSIVE': False, 'HLS_CHUNK_SECONDS': 0},
+    'progressive': {'HLS_SINGLE_PASS': True, 'HLS_PROGRESSIVE': True, 'HLS_CHUNK_SECONDS': 0},
+    'chunked': {
+        'HLS_SINGLE_PASS': True, 'HLS_PROGRESSIVE': False,
+        'HLS_CHUNK_SECONDS': 4, 'HLS_CHUNK_MIN_DURATION': 0,
+    },
+}
+
+COMPARED_METRICS = ['wall_seconds', 'cpu_seconds']
+
+
+class Command(BaseCommand):
+    """Encode generated sources with every engine and compare against a baseline."""
+
+    help = 'Benchmark HLS conversion engines on deterministic lavfi sources.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sources', nargs='+', default=DEFAULT_SOURCES, help='Sources as HEIGHT:SECONDS.')
+        parser.add_argument('--engines', nargs='+', default=list(ENGINES), choices=list(ENGINES))
+        parser.add_argument('--work-dir', help='Directory for sources and output (default: temporary).')
+        parser.add_argument(
+            '--output', default=os.path.join(tempfile.gettempdir(), 'benchmark_transcode.json'), help='JSON result file.'
+        )
+        parser.add_argument('--baseline', help='Earlier JSON result to compare against.')
+        parser.add_argument('--tolerance', type=float, default=0.15, help='Allowed relative regression.')
+
+    def handle(self, *args, **options):
+        work_dir = options['work_dir'] or tempfile.mkdtemp(prefix='benchmark-transcode-')
+        results = []
+        for spec in options['sources']:
+            source = generate_source(work_dir, *parse_source(spec))
+            for engine in options['engines']:
+                result = run_case(source, os.path.join(work_dir, 'out', engine), engine)
+                results.append(result)
+                self.stdout.write(format_result(result))
+        report = {'environment': get_environment(), 'results': results}
+        with open(options['output'], 'w') as handle:
+            json.dump(report, handle, indent=2)
+        self.stdout.write(f'Results written to {options["output"]}')
+        if not options['work_dir']:
+            shutil.rmtree(work_dir)
+        if options['baseline']:
+            self.compare(options['baseline'], results, options['tolerance'])
+
+    def compare(self, baseline_path, results, tolerance):
+        """Fail if any case got slower or bigger than the baseline allows."""
+        with open(baseline_path) as handle:
+            baseline = {get_case_key(result): result for result in json.load(handle)['results']}
+        regressions = []
+        for result in results:
+            previous = baseline.get(get_case_key(result))
+            if previous:
+                regressions += find_regressions(previous, result, tolerance)
+        for regression in regressions:
+            self.stderr.write(regression)
+        if regressions:
+            raise CommandError(f'{len(regressions)} regressions against {baseline_path}.')
+        self.stdout.write(self.style.SUCCESS('No regressions against baseline.'))
+
+
+def parse_source(spec):
+    """Parse HEIGHT:SECONDS into integers."""
+    try:
+        height, seconds = (int(value) for value in spec.split(':'))
+    except ValueError:
+        raise CommandError(f'Invalid source {spec!r}, expected HEIGHT:SECONDS.')
+    return height, seconds
+
+
+def generate_source(work_dir, height, seconds):
+    """Create a bit-exact test pattern with tone, reusing an existing file."""
+    path = os.path.join(work_dir, 'sources', f'{height}p-{seconds}s.mp4')
+    if os.path.exists(path):
+        return path
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    width = height * 16 // 9 // 2 * 2
+    cmd = [
+        'ffmpeg', '-v', 'error', '-y',
+        '-f', 'lavfi', '-i', f'testsrc2=size={width}x{height}:rate={FRAME_RATE}:duration={seconds}',
+        '-f', 'lavfi', '-i', f'sine=frequency=440:duration={seconds}',
+        '-c:v', 'libx264', '-preset', 'veryfast', '-pix_fmt', 'yuv420p', '-g', str(FRAME_RATE * 2),
+        '-c:a', 'aac', '-threads', '1', '-fflags', '+bitexact', '-flags', '+bitexact',
+        '-shortest', path,
+    ]
+    subprocess.run(cmd, check=True)
+    return path
+
+
+def run_case(source, output_base, engine):
+    """Encode one source with one engine in a child process and measure it."""
+    shutil.rmtree(output_base, ignore_errors=True)
+    probe = probe_source(source)
+    resolutions = build_ladder(probe)
+    started = time.perf_counter()
+    pid = os.fork()
+    if pid == 0:
+        os._exit(encode_in_child(source, output_base, resolutions, probe, engine))
+    _, status, usage = os.wait4(pid, 0)
+    wall = time.perf_counter() - started
+    if os.waitstatus_to_exitcode(status):
+        raise CommandError(f'Encoding {source} with {engine} failed.')
+    return {
+        'source': os.path.basename(source),
+        'engine': engine,
+        'duration': probe['duration'],
+        'wall_seconds': round(wall, 3),
+        'cpu_seconds': round(usage.ru_utime + usage.ru_stime, 3),
+        'peak_rss_kb': usage.ru_maxrss,
+        'realtime_factor': round(probe['duration'] / wall, 2) if probe['duration'] else None,
+        'renditions': {resolution: measure_rendition(output_base, resolution) for resolution in resolutions},
+    }
+
+
+def encode_in_child(source, output_base, resolutions, probe, engine):
+    """Run the engine with its settings and return an exit code."""
+    try:
+        with override_settings(**ENGINES[engine]):
+            encode_renditions(source, output_base, resolutions, probe)
+    except Exception:
+        traceback.print_exc()
+        return 1
+    return 0
+
+
+def measure_rendition(output_base, resolution):
+    """Return output size and segment count of one rendition."""
+    output_dir = os.path.join(output_base, resolution)
+    files = [entry for entry in os.scandir(output_dir) if entry.is_file()]
+    return {
+        'bytes': sum(entry.stat().st_size for entry in files),
+        'segments': sum(1 for entry in files if entry.name.endswith('.ts')),
+    }
+
+
+def get_environment():
+    """Return host details needed to judge whether results are comparable."""
+    version = subprocess.run(['ffmpeg', '-version'], capture_output=True, text=True).stdout.split('\n')[0]
+    return {
+        'ffmpeg': version,
+        'cpu_count': os.cpu_count(),
+        'machine': platform.machine(),
+        'python': platform.python_version(),
+    }
+
+
+def get_case_key(result):
+    """Return identifier of a source and engine combination."""
+    return result['source'], result['engine']
+
+
+def find_regressions(previous, current, tolerance):
+    """Return descriptions of metrics that exceed the baseline by more than tolerance."""
+    name = '/'.join(get_case_key(current))
+    checks = [(metric, previous[metric], current[metric]) for metric in COMPARED_METRICS]
+    for resolution, output in current['renditions'].items():
+        if resolution in previous['renditions']:
+            checks.append((f'{resolution} bytes', previous['renditions'][resolution]['bytes'], output['bytes']))
+    return [
+        f'{name}: {metric} {new} exceeds baseline {old} by more than {tolerance:.0%}'
+        for metric, old, new in checks
+        if old and new > old * (1 + tolerance)
+    ]
+
+
+def format_result(result):
+    """Return one-line summary of a benchmark case."""
+    sizes = ', '.join(
+        f'{resolution} {output["bytes"] // 1024} KiB/{output["segments"]} seg'
+        for resolution, output in result['renditions'].items()
+    )
+    return (
+        f'{result["source"]:>14} {result["engine"]:<14} wall {result["wall_seconds"]:7.2f}s  '
+        f'cpu {result["cpu_seconds"]:7.2f}s  rss {result["peak_rss_kb"] // 1024:5d} MiB  '
+        f'x{result["realtime_factor"]}  {sizes}'
+    )
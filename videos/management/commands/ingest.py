@@ -0,0 +1,237 @@
+"""Bulk import of a video catalog from a directory and metadata manifest."""
+import csv
+import filecmp
+import json
+import os
+import shutil
+import time
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from rq import Queue
+from rq.job import Job, JobStatus
+import django_rq
+from videos.catalog import invalidate_catalog
+from videos.models import Video
+from videos.queues import TRANSCODE_BULK, wait_for_capacity
+
+MANIFEST_NAMES = ['manifest.csv', 'manifest.json']
+REQUIRED_COLUMNS = ['file', 'title', 'description', 'category', 'thumbnail']
+LIVE_STATUSES = {JobStatus.QUEUED, JobStatus.STARTED, JobStatus.DEFERRED, JobStatus.SCHEDULED}
+
+
+class Command(BaseCommand):
+    """Create videos in batches and enqueue their HLS conversion."""
+
+    help = 'Ingest videos listed in a CSV or JSON manifest.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('directory', help='Directory containing video and thumbnail files.')
+        parser.add_argument('--manifest', help='CSV or JSON metadata file (default: manifest.csv/json in directory).')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--queue', default=TRANSCODE_BULK)
+        parser.add_argument('--dry-run', action='store_true', help='Validate the manifest without writing anything.')
+
+    def handle(self, *args, **options):
+        directory = options['directory']
+        rows = read_manifest(options['manifest'] or find_manifest(directory))
+        videos, errors = build_videos(rows, directory)
+        existing = set(Video.objects.filter(
+            video_file__in=[video.video_file.name for video, _ in videos]
+        ).values_list('video_file', flat=True))
+        pending = [(video, files) for video, files in videos if video.video_file.name not in existing]
+        errors += find_conflicts(videos)
+        for error in errors:
+            self.stderr.write(error)
+        self.stdout.write(f'{len(rows)} rows, {len(existing)} already ingested, {len(pending)} to create, {len(errors)} invalid.')
+        if options['dry_run'] or errors:
+            if errors:
+                raise CommandError('Manifest has invalid rows, nothing was ingested.')
+            return
+        queue = django_rq.get_queue(options['queue'])
+        insert_time = enqueue_time = 0.0
+        created = enqueued = 0
+        for start in range(0, len(pending), options['batch_size']):
+            batch = pending[start:start + options['batch_size']]
+            wait_for_capacity(queue)
+            began = time.perf_counter()
+            ids = create_batch(batch)
+            insert_time += time.perf_counter() - began
+            began = time.perf_counter()
+            enqueue_conversions(queue, ids)
+            enqueue_time += time.perf_counter() - began
+            created += len(ids)
+            enqueued += len(ids)
+            self.stdout.write(f'  {created}/{len(pending)} created')
+        stalled = get_stalled_ids(queue, existing)
+        if stalled:
+            wait_for_capacity(queue)
+            began = time.perf_counter()
+            enqueue_conversions(queue, stalled)
+            enqueue_time += time.perf_counter() - began
+            enqueued += len(stalled)
+        if created:
+            invalidate_catalog()
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {created} videos at {rate(created, insert_time)} rows/s, '
+            f'enqueued {enqueued} jobs at {rate(enqueued, enqueue_time)} jobs/s.'
+        ))
+
+
+def find_manifest(directory):
+    """Return default manifest path inside the ingest directory."""
+    for name in MANIFEST_NAMES:
+        path = os.path.join(directory, name)
+        if os.path.isfile(path):
+            return path
+    raise CommandError(f'No manifest.csv or manifest.json in {directory}.')
+
+
+def read_manifest(path):
+    """Return manifest rows as list of dicts."""
+    with open(path, newline='', encoding='utf-8') as handle:
+        if path.endswith('.json'):
+            rows = json.load(handle)
+        else:
+            rows = list(csv.DictReader(handle))
+    if not isinstance(rows, list):
+        raise CommandError('JSON manifest must contain a list of objects.')
+    return rows
+
+
+def build_videos(rows, directory):
+    """Validate rows and return unsaved videos with their files, plus errors."""
+    videos, errors = [], []
+    rows_by_file = {}
+    for line, row in enumerate(rows, start=1):
+        missing = [column for column in REQUIRED_COLUMNS if not row.get(column)]
+        if missing:
+            errors.append(f'Row {line}: missing {", ".join(missing)}.')
+            continue
+        files = {
+            'video_file': os.path.join(directory, row['file']),
+            'thumbnail': os.path.join(directory, row['thumbnail']),
+        }
+        try:
+            video = Video(
+                title=row['title'], description=row['description'], category=row['category'],
+                video_file=get_media_name('videos', row['file']),
+                thumbnail=get_media_name('thumbnails', row['thumbnail']),
+            )
+            video.full_clean(validate_unique=False)
+            check_files(files)
+        except ValidationError as error:
+            errors.append(f'Row {line}: {"; ".join(error.messages)}')
+            continue
+        first_line = rows_by_file.setdefault(video.video_file.name, line)
+        if first_line != line:
+            errors.append(f'Row {line}: {row["file"]} is already listed in row {first_line}.')
+            continue
+        videos.append((video, files))
+    return videos, errors
+
+
+def get_media_name(folder, path):
+    """Return storage name keeping the file's path relative to the ingest directory."""
+    relative = os.path.normpath(path)
+    if os.path.isabs(relative) or relative.split(os.sep)[0] in ('', os.pardir):
+        raise ValidationError(f'File must be inside the ingest directory: {path}')
+    return '/'.join([folder, *relative.split(os.sep)])
+
+
+def check_files(files):
+    """Raise ValidationError if a referenced file does not exist."""
+    for path in files.values():
+        if not os.path.isfile(path):
+            raise ValidationError(f'File not found: {path}')
+
+
+def get_target(name):
+    """Return filesystem path of a storage name in MEDIA_ROOT."""
+    return os.path.join(settings.MEDIA_ROOT, name)
+
+
+def is_imported(source, target):
+    """Return True if target exists with exactly the content of source."""
+    if not os.path.exists(target):
+        return False
+    return os.path.samefile(source, target) or filecmp.cmp(source, target, shallow=False)
+
+
+def find_conflicts(videos):
+    """Return errors for targets that already exist in MEDIA_ROOT with other content."""
+    errors = set()
+    for video, files in videos:
+        for field, path in files.items():
+            name = getattr(video, field).name
+            target = get_target(name)
+            if os.path.exists(target) and not is_imported(path, target):
+                errors.add(f'{name} already exists in MEDIA_ROOT with different content than {path}.')
+    return sorted(errors)
+
+
+def import_file(source, name):
+    """Hard-link or copy a file into MEDIA_ROOT, never replacing an existing file."""
+    target = get_target(name)
+    if is_imported(source, target):
+        return
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    try:
+        link_or_copy(source, target)
+    except FileExistsError:
+        raise CommandError(f'{name} appeared in MEDIA_ROOT during ingest, nothing was overwritten.')
+
+
+def link_or_copy(source, target):
+    """Hard-link source to a new target, copying through a temporary file across filesystems."""
+    try:
+        os.link(source, target)
+    except FileExistsError:
+        raise
+    except OSError:
+        partial = f'{target}.{os.getpid()}.part'
+        shutil.copy2(source, partial)
+        try:
+            os.link(partial, target)
+        finally:
+            os.remove(partial)
+
+
+def create_batch(batch):
+    """Import files and insert one batch of videos, returning their ids."""
+    for video, files in batch:
+        for field, path in files.items():
+            import_file(path, getattr(video, field).name)
+    with transaction.atomic():
+        return [video.pk for video in Video.objects.bulk_create([video for video, _ in batch])]
+
+
+def get_job_id(video_pk):
+    """Return deterministic id of a video's ingest conversion job."""
+    return f'ingest-convert-{video_pk}'
+
+
+def enqueue_conversions(queue, video_ids):
+    """Enqueue HLS conversions in one Redis round trip."""
+    jobs = [
+        Queue.prepare_data('videos.tasks.convert_to_hls', (pk,), job_id=get_job_id(pk))
+        for pk in video_ids
+    ]
+    with queue.connection.pipeline() as pipe:
+        queue.enqueue_many(jobs, pipeline=pipe)
+        pipe.execute()
+
+
+def get_stalled_ids(queue, video_files):
+    """Return ids of previously ingested, unconverted videos without a live job."""
+    ids = list(Video.objects.filter(
+        video_file__in=video_files, hls_completed_at__isnull=True, renditions__isnull=True
+    ).values_list('pk', flat=True))
+    jobs = Job.fetch_many([get_job_id(pk) for pk in ids], connection=queue.connection)
+    return [pk for pk, job in zip(ids, jobs) if job is None or job.get_status() not in LIVE_STATUSES]
+
+
+def rate(count, seconds):
+    """Format throughput per second."""
+    return f'{count / seconds:.0f}' if seconds else '-'
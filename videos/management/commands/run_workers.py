@@ -0,0 +1,95 @@
+"""Launch RQ workers sized to the CPU cores available to this node."""
+import os
+import signal
+import subprocess
+import sys
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from videos.queues import TRANSCODE_QUEUES
+
+RESTART_DELAY = 5
+
+
+class Command(BaseCommand):
+    """Start and supervise worker processes for the given queues."""
+
+    help = 'Start RQ workers with concurrency and FFMPEG threads sized to the available cores.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('queues', nargs='*', default=TRANSCODE_QUEUES, help='Queues in priority order.')
+        parser.add_argument('--workers', type=int, help='Override number of worker processes.')
+
+    def handle(self, *args, **options):
+        queues = options['queues']
+        cores = get_available_cores()
+        workers, threads = size_workers(queues, cores, options['workers'])
+        env = build_worker_env(threads)
+        self.stdout.write(
+            f'{cores} cores: starting {workers} workers on {", ".join(queues)} '
+            f'with {threads or "auto"} FFMPEG threads each'
+        )
+        supervise([build_worker_command(queues, i == 0) for i in range(workers)], env)
+
+
+def get_available_cores():
+    """Return usable cores, honouring CPU affinity and cgroup quotas."""
+    if hasattr(os, 'sched_getaffinity'):
+        cores = len(os.sched_getaffinity(0))
+    else:
+        cores = os.cpu_count() or 1
+    try:
+        with open('/sys/fs/cgroup/cpu.max') as handle:
+            quota, period = handle.read().split()
+        if quota != 'max':
+            cores = min(cores, max(1, int(quota) // int(period)))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+
+def size_workers(queues, cores, workers=None):
+    """Return worker count and FFMPEG threads per worker for the queues."""
+    if not set(queues) & set(TRANSCODE_QUEUES):
+        return workers or settings.RQ_LIGHT_WORKERS, 0
+    workers = workers or max(1, cores // settings.RQ_TRANSCODE_THREADS)
+    return workers, max(1, cores // workers)
+
+
+def build_worker_env(threads):
+    """Return environment giving each worker its share of the cores."""
+    env = dict(os.environ)
+    if threads:
+        env['HLS_FFMPEG_THREADS'] = str(threads)
+        env['HLS_CHUNK_WORKERS'] = str(min(settings.HLS_CHUNK_WORKERS, threads))
+    return env
+
+
+def build_worker_command(queues, with_scheduler):
+    """Return rqworker command line for one worker process."""
+    cmd = [sys.executable, str(settings.BASE_DIR / 'manage.py'), 'rqworker', *queues]
+    if with_scheduler:
+        cmd.append('--with-scheduler')
+    return cmd
+
+
+def supervise(commands, env):
+    """Run worker processes, restart crashed ones and forward shutdown signals."""
+    processes = [subprocess.Popen(cmd, env=env) for cmd in commands]
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for process in processes:
+            if process.poll() is None:
+                process.send_signal(signum)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    while not stopping or any(process.poll() is None for process in processes):
+        for i, process in enumerate(processes):
+            if not stopping and process.poll() is not None:
+                time.sleep(RESTART_DELAY)
+                processes[i] = subprocess.Popen(commands[i], env=env)
+        time.sleep(1)
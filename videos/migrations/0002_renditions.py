@@ -0,0 +1,40 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:02
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_hls_completed_at(apps, schema_editor):
+    """Mark videos published before completion tracking as converted at upload time."""
+    Video = apps.get_model('videos', 'Video')
+    Video.objects.filter(hls_completed_at__isnull=True).update(hls_completed_at=models.F('created_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='hls_completed_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.CreateModel(
+            name='VideoRendition',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('resolution', models.CharField(max_length=10)),
+                ('status', models.CharField(choices=[('pending', 'Pending'), ('encoding', 'Encoding'), ('done', 'Done'), ('failed', 'Failed')], default='pending', max_length=10)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('video', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='renditions', to='videos.video')),
+            ],
+            options={
+                'ordering': ['video', 'resolution'],
+                'constraints': [models.UniqueConstraint(fields=('video', 'resolution'), name='unique_video_resolution')],
+            },
+        ),
+        migrations.RunPython(backfill_hls_completed_at, migrations.RunPython.noop),
+    ]
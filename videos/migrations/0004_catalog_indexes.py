@@ -0,0 +1,25 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0003_source_probe'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='video',
+            options={'ordering': ['-created_at', '-id']},
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['-created_at', '-id'], name='video_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='video',
+            index=models.Index(fields=['category', '-created_at', '-id'], name='video_category_created_idx'),
+        ),
+    ]
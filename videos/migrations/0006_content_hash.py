@@ -0,0 +1,23 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0005_uploads'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='content_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.AddField(
+            model_name='videorendition',
+            name='checksum',
+            field=models.CharField(blank=True, max_length=64),
+        ),
+    ]
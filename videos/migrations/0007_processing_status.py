@@ -0,0 +1,71 @@
+# Generated by Django 6.0.1 on 2026-10-18 06:26
+
+import glob
+import os
+from django.conf import settings
+from django.db import migrations, models
+
+
+def has_hls_output(video_pk):
+    """Return True if any rendition manifest of a video exists on disk."""
+    return bool(glob.glob(os.path.join(settings.MEDIA_ROOT, 'hls', str(video_pk), '*', 'index.m3u8')))
+
+
+def mark_converted_ready(apps, schema_editor):
+    """Set videos converted before status tracking to ready, backfilling their completion time."""
+    Video = apps.get_model('videos', 'Video')
+    unrecorded = Video.objects.filter(hls_completed_at__isnull=True).values_list('pk', flat=True)
+    converted = [pk for pk in unrecorded.iterator() if has_hls_output(pk)]
+    Video.objects.filter(pk__in=converted).update(hls_completed_at=models.F('created_at'))
+    Video.objects.filter(hls_completed_at__isnull=False).update(status='ready')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0006_content_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='error',
+            field=models.TextField(blank=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='status',
+            field=models.CharField(choices=[('pending', 'Pending'), ('probing', 'Probing'), ('encoding', 'Encoding'), ('ready', 'Ready'), ('failed', 'Failed')], default='pending', max_length=10),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='timings',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+        migrations.AddField(
+            model_name='videorendition',
+            name='encode_speed',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videorendition',
+            name='finished_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videorendition',
+            name='progress',
+            field=models.FloatField(default=0),
+        ),
+        migrations.AddField(
+            model_name='videorendition',
+            name='size_bytes',
+            field=models.BigIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='videorendition',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.RunPython(mark_converted_ready, migrations.RunPython.noop),
+    ]
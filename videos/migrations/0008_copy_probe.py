@@ -0,0 +1,28 @@
+# Generated by Django 6.0.1 on 2026-10-18 09:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('videos', '0007_processing_status'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='video',
+            name='keyframe_interval',
+            field=models.FloatField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='pix_fmt',
+            field=models.CharField(blank=True, max_length=20),
+        ),
+        migrations.AddField(
+            model_name='video',
+            name='profile',
+            field=models.CharField(blank=True, max_length=40),
+        ),
+    ]
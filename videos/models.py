@@ -1,8 +1,13 @@
 """Video models for Videoflix."""
-from django.db import models
+import uuid
+from functools import partial
+from django.conf import settings
+from django.db import models, transaction
 from django.dispatch import receiver
 from django.db.models.signals import post_save, post_delete
 import django_rq
+from .catalog import invalidate_catalog
+from .queues import TRANSCODE_HIGH
 
 
 class Video(models.Model):
@@ -16,31 +21,135 @@ class Video(models.Model):
         ('documentary', 'Documentary'),
     ]
 
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('probing', 'Probing'),
+        ('encoding', 'Encoding'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+
     created_at = models.DateTimeField(auto_now_add=True)
     title = models.CharField(max_length=100)
     description = models.TextField(max_length=500)
     video_file = models.FileField(upload_to='videos/')
     thumbnail = models.ImageField(upload_to='thumbnails/')
     category = models.CharField(max_length=20, choices=CATEGORY_CHOICES)
+    hls_completed_at = models.DateTimeField(null=True, blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    error = models.TextField(blank=True)
+    timings = models.JSONField(default=dict, blank=True)
+    content_hash = models.CharField(max_length=64, blank=True, db_index=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    duration = models.FloatField(null=True, blank=True)
+    fps = models.FloatField(null=True, blank=True)
+    video_codec = models.CharField(max_length=20, blank=True)
+    audio_codec = models.CharField(max_length=20, blank=True)
+    pix_fmt = models.CharField(max_length=20, blank=True)
+    profile = models.CharField(max_length=40, blank=True)
+    keyframe_interval = models.FloatField(null=True, blank=True)
+    bitrate = models.PositiveIntegerField(null=True, blank=True)
 
     class Meta:
-        ordering = ['-created_at']
+        ordering = ['-created_at', '-id']
+        indexes = [
+            models.Index(fields=['-created_at', '-id'], name='video_created_idx'),
+            models.Index(fields=['category', '-created_at', '-id'], name='video_category_created_idx'),
+        ]
 
     def __str__(self):
         return self.title
 
+    @property
+    def progress(self):
+        """Return average encode progress of all renditions in percent."""
+        values = [rendition.progress for rendition in self.renditions.all()]
+        return round(sum(values) / len(values), 1) if values else 0.0
+
+
+class VideoRendition(models.Model):
+    """Model tracking HLS conversion status of one video resolution."""
+
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('encoding', 'Encoding'),
+        ('done', 'Done'),
+        ('failed', 'Failed'),
+    ]
+
+    video = models.ForeignKey(Video, on_delete=models.CASCADE, related_name='renditions')
+    resolution = models.CharField(max_length=10)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='pending')
+    checksum = models.CharField(max_length=64, blank=True)
+    progress = models.FloatField(default=0)
+    encode_speed = models.FloatField(null=True, blank=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+    size_bytes = models.BigIntegerField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['video', 'resolution']
+        constraints = [
+            models.UniqueConstraint(fields=['video', 'resolution'], name='unique_video_resolution'),
+        ]
+
+    def __str__(self):
+        return f'{self.video_id} {self.resolution} ({self.status})'
+
+    @property
+    def encode_seconds(self):
+        """Return wall-clock encode duration or None while unfinished."""
+        if self.started_at and self.finished_at:
+            return (self.finished_at - self.started_at).total_seconds()
+        return None
+
+
+class Upload(models.Model):
+    """Model tracking a resumable upload of a video source file."""
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    created_by = models.ForeignKey(settings.AUTH_USER_MODEL, on_delete=models.SET_NULL, null=True)
+    filename = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=255)
+    size = models.BigIntegerField()
+    offset = models.BigIntegerField(default=0)
+    sha256 = models.CharField(max_length=64, blank=True)
+    video = models.OneToOneField(Video, on_delete=models.SET_NULL, null=True, blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['-created_at']
+
+    def __str__(self):
+        return f'{self.filename} ({self.offset}/{self.size})'
+
+    @property
+    def is_complete(self):
+        """Return True once every byte has been received."""
+        return self.offset == self.size
+
 
 @receiver(post_save, sender=Video)
 def video_post_save(sender, instance, created, **kwargs):
-    """Trigger HLS conversion after video upload."""
+    """Trigger HLS conversion after upload and refresh the catalog."""
+    transaction.on_commit(invalidate_catalog)
     if created:
-        queue = django_rq.get_queue('default', autocommit=True)
-        queue.enqueue('videos.tasks.convert_to_hls', instance.pk)
+        transaction.on_commit(partial(enqueue_conversion, instance.pk))
+
+
+def enqueue_conversion(video_pk):
+    """Queue HLS conversion of a committed video."""
+    queue = django_rq.get_queue(TRANSCODE_HIGH, autocommit=True)
+    queue.enqueue('videos.tasks.convert_to_hls', video_pk)
 
 
 @receiver(post_delete, sender=Video)
 def video_post_delete(sender, instance, **kwargs):
-    """Delete video files when video is deleted."""
+    """Delete video files and refresh the catalog when video is deleted."""
+    transaction.on_commit(invalidate_catalog)
     if instance.video_file:
         instance.video_file.delete(save=False)
     if instance.thumbnail:
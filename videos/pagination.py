@@ -0,0 +1,65 @@
+"""Keyset pagination for the video catalog."""
+import base64
+from datetime import datetime
+from django.conf import settings
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(video):
+    """Encode (created_at, id) of the last row into an opaque cursor."""
+    position = f'{video.created_at.isoformat()}|{video.pk}'
+    return base64.urlsafe_b64encode(position.encode()).decode()
+
+
+def decode_cursor(cursor):
+    """Decode cursor into (created_at, id) or raise NotFound."""
+    try:
+        created_at, pk = base64.urlsafe_b64decode(cursor.encode()).decode().split('|')
+        return datetime.fromisoformat(created_at), int(pk)
+    except (ValueError, UnicodeDecodeError):
+        raise NotFound('Invalid cursor.')
+
+
+class VideoCursorPagination(BasePagination):
+    """Paginate videos by (created_at, id) with one indexed range scan per page."""
+
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'page_size'
+
+    def get_page_size(self, request):
+        """Return requested page size clamped to the configured maximum."""
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, settings.VIDEO_PAGE_SIZE))
+        except ValueError:
+            size = settings.VIDEO_PAGE_SIZE
+        return max(1, min(size, settings.VIDEO_MAX_PAGE_SIZE))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        """Return one page of videos after the cursor position."""
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by('-created_at', '-id')
+        cursor = request.query_params.get(self.cursor_query_param)
+        if cursor:
+            created_at, pk = decode_cursor(cursor)
+            queryset = queryset.filter(
+                Q(created_at__lte=created_at) & (Q(created_at__lt=created_at) | Q(id__lt=pk))
+            )
+        page = list(queryset[:page_size + 1])
+        self.next_video = page[page_size - 1] if len(page) > page_size else None
+        return page[:page_size]
+
+    def get_next_link(self):
+        """Return URL of the following page or None on the last page."""
+        if self.next_video is None:
+            return None
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(self.next_video))
+
+    def get_paginated_response(self, data):
+        """Wrap page data with the link to the next page."""
+        return Response({'next': self.get_next_link(), 'results': data})
@@ -0,0 +1,12 @@
+"""Permissions for video streaming endpoints."""
+from rest_framework.permissions import BasePermission
+from .signing import verify_segment_query
+
+
+class HasSegmentSignature(BasePermission):
+    """Allow segment requests carrying a valid signed query."""
+
+    def has_permission(self, request, view):
+        """Verify signature statelessly without touching the database."""
+        kwargs = request.parser_context['kwargs']
+        return verify_segment_query(request.query_params, kwargs['movie_id'], kwargs['resolution'])
@@ -0,0 +1,85 @@
+"""Source inspection with FFPROBE."""
+import json
+import subprocess
+
+KEYFRAME_PROBE_SECONDS = 120
+
+
+def run_ffprobe(source_path):
+    """Return FFPROBE stream and format data as dict."""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-print_format', 'json',
+        '-show_streams', '-show_format',
+        source_path
+    ]
+    output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    return json.loads(output)
+
+
+def run_keyframe_probe(source_path):
+    """Return presentation times of video keyframe packets at the start of a source."""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-read_intervals', f'%+{KEYFRAME_PROBE_SECONDS}',
+        '-show_entries', 'packet=pts_time,flags',
+        '-print_format', 'csv=p=0',
+        source_path
+    ]
+    output = subprocess.run(cmd, check=True, capture_output=True, text=True).stdout
+    times = []
+    for line in output.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' in flags and to_number(pts_time, float) is not None:
+            times.append(float(pts_time))
+    return sorted(times)
+
+
+def get_keyframe_interval(times):
+    """Return longest gap between keyframes or None if it cannot be measured."""
+    if len(times) < 2:
+        return None
+    return round(max(b - a for a, b in zip(times, times[1:])), 3)
+
+
+def get_stream(data, codec_type):
+    """Return first stream of given type or empty dict."""
+    for stream in data.get('streams', []):
+        if stream.get('codec_type') == codec_type:
+            return stream
+    return {}
+
+
+def parse_frame_rate(rate):
+    """Convert FFPROBE frame rate fraction to float."""
+    num, _, den = (rate or '0/1').partition('/')
+    return float(num) / float(den or 1) if float(den or 1) else 0.0
+
+
+def to_number(value, cast=int):
+    """Convert FFPROBE numeric string or return None."""
+    try:
+        return cast(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def probe_source(source_path):
+    """Return resolution, duration, fps, codecs, pixel format, GOP and bitrate of a source."""
+    data = run_ffprobe(source_path)
+    video = get_stream(data, 'video')
+    audio = get_stream(data, 'audio')
+    fmt = data.get('format', {})
+    return {
+        'width': to_number(video.get('width')),
+        'height': to_number(video.get('height')),
+        'duration': to_number(fmt.get('duration'), float),
+        'fps': parse_frame_rate(video.get('avg_frame_rate')) or None,
+        'video_codec': video.get('codec_name', ''),
+        'audio_codec': audio.get('codec_name', ''),
+        'pix_fmt': video.get('pix_fmt', ''),
+        'profile': video.get('profile', ''),
+        'keyframe_interval': get_keyframe_interval(run_keyframe_probe(source_path)) if video else None,
+        'bitrate': to_number(video.get('bit_rate')) or to_number(fmt.get('bit_rate')),
+    }
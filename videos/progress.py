@@ -0,0 +1,104 @@
+"""FFMPEG execution with progress reporting."""
+import os
+import subprocess
+import tempfile
+import time
+from contextlib import contextmanager
+from django.conf import settings
+
+PROGRESS_INTERVAL = 2
+STDERR_TAIL_BYTES = 4000
+
+
+def run_ffmpeg(cmd, on_progress=None):
+    """Run FFMPEG, passing (seconds, speed) to on_progress and raising with stderr tail on failure."""
+    cmd = [cmd[0], '-progress', 'pipe:1', '-nostats', *cmd[1:]]
+    with tempfile.TemporaryFile() as stderr:
+        process = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=stderr, text=True)
+        for seconds, speed in parse_progress(process.stdout):
+            if on_progress:
+                on_progress(seconds, speed)
+        if process.wait():
+            raise subprocess.CalledProcessError(process.returncode, cmd, stderr=read_tail(stderr))
+
+
+def parse_progress(lines):
+    """Yield (output seconds, speed) for each block of FFMPEG -progress output."""
+    values = {}
+    for line in lines:
+        key, _, value = line.strip().partition('=')
+        values[key] = value
+        if key == 'progress':
+            yield to_seconds(values.get('out_time_us')), to_speed(values.get('speed'))
+            values = {}
+
+
+def to_seconds(microseconds):
+    """Convert FFMPEG out_time_us to seconds."""
+    try:
+        return max(0.0, int(microseconds) / 1000000)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+def to_speed(speed):
+    """Convert FFMPEG speed like '1.5x' to float or None."""
+    try:
+        return float(speed.rstrip('x'))
+    except (AttributeError, ValueError):
+        return None
+
+
+def read_tail(handle):
+    """Return the last bytes of a captured stream as text."""
+    size = os.fstat(handle.fileno()).st_size
+    handle.seek(max(0, size - STDERR_TAIL_BYTES))
+    return handle.read().decode(errors='replace')
+
+
+def describe_error(error):
+    """Return failure reason for storing on a video."""
+    if isinstance(error, subprocess.CalledProcessError) and error.stderr:
+        return f'{error}\n{error.stderr}'
+    return f'{type(error).__name__}: {error}'
+
+
+@contextmanager
+def timed(timings, stage):
+    """Record wall-clock seconds of a processing stage into timings."""
+    start = time.monotonic()
+    try:
+        yield
+    finally:
+        timings[stage] = round(time.monotonic() - start, 3)
+
+
+class RenditionProgress:
+    """Throttled writer of encode progress for renditions sharing one FFMPEG pass."""
+
+    def __init__(self, video_pk, resolutions, duration):
+        self.video_pk = video_pk
+        self.resolutions = resolutions
+        self.duration = duration
+        self.last_write = 0.0
+        self.listed = False
+
+    def __call__(self, seconds, speed):
+        """Write progress at most every PROGRESS_INTERVAL seconds, listing the video once output exists."""
+        now = time.monotonic()
+        if now - self.last_write < PROGRESS_INTERVAL:
+            return
+        self.last_write = now
+        percent = min(100.0, 100 * seconds / self.duration) if self.duration else 0.0
+        self.write(round(percent, 1), speed)
+        if settings.HLS_PROGRESSIVE and percent > 0 and not self.listed:
+            from .catalog import invalidate_catalog
+            invalidate_catalog()
+            self.listed = True
+
+    def write(self, percent, speed):
+        """Store progress on the rendition rows without touching other fields."""
+        from .models import VideoRendition
+        VideoRendition.objects.filter(video_id=self.video_pk, resolution__in=self.resolutions).update(
+            progress=percent, encode_speed=speed
+        )
@@ -0,0 +1,28 @@
+"""RQ queue routing and backpressure for video jobs."""
+import time
+from django.conf import settings
+from rq import get_current_job
+import django_rq
+
+TRANSCODE_HIGH = 'transcode_high'
+TRANSCODE_BULK = 'transcode_bulk'
+LIGHT = 'light'
+TRANSCODE_QUEUES = [TRANSCODE_HIGH, TRANSCODE_BULK]
+
+
+def get_transcode_queue():
+    """Return queue of the running transcode job, or the high-priority queue."""
+    job = get_current_job()
+    name = job.origin if job and job.origin in TRANSCODE_QUEUES else TRANSCODE_HIGH
+    return django_rq.get_queue(name)
+
+
+def is_queue_full(queue):
+    """Return True if queue holds more waiting jobs than allowed."""
+    return queue.count >= settings.RQ_MAX_QUEUE_DEPTH
+
+
+def wait_for_capacity(queue, poll_interval=5):
+    """Block until queue depth drops below the configured maximum."""
+    while is_queue_full(queue):
+        time.sleep(poll_interval)
@@ -14,7 +14,19 @@ class VideoSerializer(serializers.ModelSerializer):
 
     def get_thumbnail_url(self, obj):
         """Return absolute URL for thumbnail."""
+        base_url = self.context.get('base_url')
+        if obj.thumbnail and base_url:
+            return base_url + obj.thumbnail.url
         request = self.context.get('request')
         if obj.thumbnail and request:
             return request.build_absolute_uri(obj.thumbnail.url)
         return None
+
+
+class VideoUploadSerializer(serializers.ModelSerializer):
+    """Serializer for metadata that completes a resumable upload."""
+
+    class Meta:
+        model = Video
+        fields = ['id', 'title', 'description', 'thumbnail', 'category']
+        read_only_fields = ['id']
@@ -0,0 +1,57 @@
+"""Signed, expiring HLS segment URLs."""
+import time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.utils.crypto import constant_time_compare, salted_hmac
+
+SIGNING_SALT = 'videos.signing.segment'
+
+
+def get_expiry(now=None):
+    """Return expiry rounded to TTL buckets so signed URLs stay cacheable."""
+    ttl = settings.HLS_SIGNED_URL_TTL
+    now = int(now if now is not None else time.time())
+    return (now // ttl + 2) * ttl
+
+
+def sign(user_id, movie_id, resolution, expires):
+    """Return HMAC signature bound to user, movie, resolution and expiry."""
+    value = f'{user_id}:{movie_id}:{resolution}:{expires}'
+    return salted_hmac(SIGNING_SALT, value, algorithm='sha256').hexdigest()
+
+
+def build_segment_query(user_id, movie_id, resolution):
+    """Return query string authorizing segment requests of one rendition."""
+    expires = get_expiry()
+    signature = sign(user_id, movie_id, resolution, expires)
+    return urlencode({'u': user_id, 'e': expires, 's': signature})
+
+
+def verify_segment_query(params, movie_id, resolution):
+    """Return True if query parameters carry a valid, unexpired signature."""
+    try:
+        user_id = int(params['u'])
+        expires = int(params['e'])
+        signature = params['s']
+    except (KeyError, ValueError):
+        return False
+    if expires < time.time():
+        return False
+    return constant_time_compare(signature, sign(user_id, movie_id, resolution, expires))
+
+
+def limit_cache_control(cache_control, expires):
+    """Cap private and shared cache lifetimes at the time left before expiry."""
+    remaining = max(0, expires - int(time.time()))
+    max_age = min(cache_control.get('max_age', remaining), remaining)
+    return {**cache_control, 'max_age': max_age, 's_maxage': max_age}
+
+
+def sign_manifest(content, query):
+    """Append signed query to every segment URI of a media playlist."""
+    lines = []
+    for line in content.splitlines():
+        if line and not line.startswith('#'):
+            line = f'{line}/?{query}'
+        lines.append(line)
+    return '\n'.join(lines) + '\n'
@@ -0,0 +1,107 @@
+"""Non-blocking HLS delivery for async views under an ASGI server."""
+import asyncio
+import os
+from django.conf import settings
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from core.metrics import HLS_BYTES
+from .signing import build_segment_query, sign_manifest
+from .utils import (
+    HLS_KINDS, MANIFEST_CONTENT_TYPE, MANIFEST_NAME, SEGMENT_CONTENT_TYPE, RangeNotSatisfiable, build_etag,
+    get_fresh_hot_file, get_hot_key, get_manifest_path, get_requested_range, get_segment_cache_control,
+    get_segment_path, load_hot_file, offload_file, range_not_satisfiable, read_manifest, serve_hot_file,
+    set_validators, stat_file
+)
+
+CHUNK_SIZE = 256 * 1024
+
+
+async def read_chunks(file_path, offset, length):
+    """Yield a byte range of a file, reading each chunk in a worker thread."""
+    fd = await asyncio.to_thread(os.open, file_path, os.O_RDONLY)
+    try:
+        while length > 0:
+            data = await asyncio.to_thread(os.pread, fd, min(CHUNK_SIZE, length), offset)
+            if not data:
+                break
+            offset += len(data)
+            length -= len(data)
+            yield data
+    finally:
+        os.close(fd)
+
+
+async def aget_hot_file(key, file_path):
+    """Async variant of get_hot_file; only stale or missing entries cost a thread hop."""
+    entry = get_fresh_hot_file(key)
+    if entry is None:
+        entry = await asyncio.to_thread(load_hot_file, key, file_path)
+    return entry
+
+
+async def aserve_file(request, file_path, content_type, cache_control, hot_key=None):
+    """Async variant of serve_file: validators, conditional and range support, or raise 404."""
+    entry = await aget_hot_file(hot_key, file_path) if hot_key else None
+    if entry is not None:
+        return serve_hot_file(request, entry, content_type, cache_control)
+    file_stat = await asyncio.to_thread(stat_file, file_path)
+    etag = build_etag(file_stat)
+    last_modified = int(file_stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None and settings.HLS_OFFLOAD:
+        response = offload_file(file_path, content_type)
+        HLS_BYTES.labels(HLS_KINDS[content_type]).inc(file_stat.st_size)
+    elif response is None:
+        response = build_streaming_response(request, file_path, file_stat, content_type, etag)
+        HLS_BYTES.labels(HLS_KINDS[content_type]).inc(int(response.get('Content-Length', 0)))
+    return set_validators(response, etag, last_modified, cache_control)
+
+
+def build_streaming_response(request, file_path, file_stat, content_type, etag):
+    """Return full or single-range response streaming the file in chunks."""
+    size = file_stat.st_size
+    try:
+        byte_range = get_requested_range(request, size, etag, int(file_stat.st_mtime))
+    except RangeNotSatisfiable:
+        return range_not_satisfiable(content_type, size)
+    start, end = byte_range or (0, size - 1)
+    length = end - start + 1
+    response = StreamingHttpResponse(
+        read_chunks(file_path, start, length), status=206 if byte_range else 200, content_type=content_type
+    )
+    response['Content-Length'] = str(length)
+    if byte_range:
+        response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+async def aserve_manifest(request, movie_id, resolution):
+    """Async variant of serve_manifest."""
+    path = get_manifest_path(movie_id, resolution)
+    if settings.HLS_SIGNED_URLS:
+        return await aserve_signed_manifest(request, path, movie_id, resolution)
+    hot_key = get_hot_key(movie_id, resolution, MANIFEST_NAME)
+    return await aserve_file(request, path, MANIFEST_CONTENT_TYPE, settings.HLS_MANIFEST_CACHE_CONTROL, hot_key)
+
+
+async def aserve_signed_manifest(request, path, movie_id, resolution):
+    """Async variant of serve_signed_manifest."""
+    hot_key = get_hot_key(movie_id, resolution, MANIFEST_NAME)
+    entry = get_fresh_hot_file(hot_key) if hot_key else None
+    if entry is not None:
+        content = entry.data.decode()
+    else:
+        content = await asyncio.to_thread(read_manifest, path, hot_key)
+    query = build_segment_query(request.user.pk, movie_id, resolution)
+    response = HttpResponse(sign_manifest(content, query), content_type=MANIFEST_CONTENT_TYPE)
+    HLS_BYTES.labels('manifest').inc(len(response.content))
+    patch_cache_control(response, **settings.HLS_MANIFEST_CACHE_CONTROL)
+    return response
+
+
+async def aserve_segment(request, movie_id, resolution, segment):
+    """Async variant of serve_segment."""
+    path = get_segment_path(movie_id, resolution, segment)
+    hot_key = get_hot_key(movie_id, resolution, segment)
+    return await aserve_file(request, path, SEGMENT_CONTENT_TYPE, get_segment_cache_control(request), hot_key)
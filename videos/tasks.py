@@ -1,51 +1,435 @@
 """Background tasks for video processing."""
-import subprocess
 import os
+import shutil
+import time
+from contextlib import contextmanager
 from django.conf import settings
+from django.utils import timezone
+from rq import Retry
+from core.metrics import record_job_duration
+from .catalog import invalidate_catalog
+from .chunking import convert_chunked, use_chunked_encoding
+from .dedup import get_rendition_checksum, hash_file, link_rendition
+from .probe import probe_source
+from .progress import RenditionProgress, describe_error, run_ffmpeg, timed
+from .queues import get_transcode_queue
+
+RESOLUTIONS = ['480p', '720p', '1080p']
+
+LADDER = {
+    '480p': {'height': 480, 'bitrate': 1400000},
+    '720p': {'height': 720, 'bitrate': 2800000},
+    '1080p': {'height': 1080, 'bitrate': 5000000},
+}
+
+PROBE_FIELDS = [
+    'width', 'height', 'duration', 'fps', 'video_codec', 'audio_codec', 'pix_fmt', 'profile', 'keyframe_interval',
+    'bitrate',
+]
+
+COPY_PROFILES = {'Main', 'High'}
+
+COPY_PIX_FMTS = {'yuv420p'}
+
+MAX_COPY_KEYFRAME_INTERVAL = 4.0
+
+
+def get_output_base(video_pk):
+    """Return base directory for HLS output of a video."""
+    return os.path.join(settings.MEDIA_ROOT, 'hls', str(video_pk))
 
 
 def convert_to_hls(video_pk):
-    """Convert video to HLS format in multiple resolutions."""
+    """Convert video to HLS format, recording status, failure reason and duration."""
+    start = time.monotonic()
+    try:
+        process_video(video_pk)
+    except Exception as error:
+        set_video_status(video_pk, 'failed', error=describe_error(error))
+        record_job_duration('convert_to_hls', 'failed', time.monotonic() - start)
+        raise
+    record_job_duration('convert_to_hls', 'finished', time.monotonic() - start)
+
+
+def process_video(video_pk):
+    """Probe, deduplicate and encode missing renditions, reusing intact output."""
     from .models import Video
     video = Video.objects.get(pk=video_pk)
-    source_path = video.video_file.path
-    output_base = os.path.join(settings.MEDIA_ROOT, 'hls', str(video_pk))
+    timings = {}
+    set_video_status(video_pk, 'probing', error='')
+    with timed(timings, 'probe'):
+        probe = probe_video(video)
+    with timed(timings, 'hash'):
+        ensure_content_hash(video)
+    with timed(timings, 'reuse'):
+        reuse_donor_output(video)
+    resolutions = get_missing_renditions(video_pk, build_ladder(probe))
+    if not resolutions:
+        set_video_status(video_pk, 'encoding', timings=timings)
+        finalize_hls(video_pk)
+        return
+    set_rendition_status(video_pk, resolutions, 'pending')
+    set_video_status(video_pk, 'encoding', timings=timings)
+    if settings.HLS_FAN_OUT:
+        enqueue_renditions(video_pk, resolutions)
+        return
+    output_base = get_output_base(video_pk)
+    try:
+        with timed(timings, 'encode'):
+            clear_renditions(output_base, resolutions)
+            encode_renditions(video.video_file.path, output_base, resolutions, probe, video_pk)
+    except Exception:
+        fail_renditions(video_pk, resolutions)
+        raise
+    set_video_status(video_pk, 'encoding', timings=timings)
+    finalize_hls(video_pk)
+
+
+def set_video_status(video_pk, status, **fields):
+    """Update processing status and refresh the catalog when visibility changes."""
+    from .models import Video
+    Video.objects.filter(pk=video_pk).update(status=status, **fields)
+    if status in ('ready', 'failed'):
+        invalidate_catalog()
+
+
+def ensure_content_hash(video):
+    """Hash the source once so identical uploads can share HLS output."""
+    if not video.content_hash:
+        video.content_hash = hash_file(video.video_file.path)
+        type(video).objects.filter(pk=video.pk).update(content_hash=video.content_hash)
+
+
+def reuse_donor_output(video):
+    """Link finished renditions of an identical source into this video's output."""
+    from .models import Video, VideoRendition
+    donor = Video.objects.filter(
+        content_hash=video.content_hash, hls_completed_at__isnull=False
+    ).exclude(pk=video.pk).first()
+    if donor is None:
+        return []
+    done = set(VideoRendition.objects.filter(video=video, status='done').values_list('resolution', flat=True))
+    reused = []
+    for rendition in donor.renditions.filter(status='done').exclude(resolution__in=done):
+        link_rendition(
+            os.path.join(get_output_base(donor.pk), rendition.resolution),
+            os.path.join(get_output_base(video.pk), rendition.resolution),
+        )
+        VideoRendition.objects.update_or_create(
+            video=video, resolution=rendition.resolution,
+            defaults={'status': 'done', 'checksum': rendition.checksum},
+        )
+        reused.append(rendition.resolution)
+    return reused
+
+
+def get_missing_renditions(video_pk, resolutions):
+    """Return resolutions not yet recorded as done with a matching checksum."""
+    from .models import VideoRendition
+    output_base = get_output_base(video_pk)
+    checksums = dict(
+        VideoRendition.objects.filter(video_id=video_pk, status='done').values_list('resolution', 'checksum')
+    )
+    return [
+        resolution for resolution in resolutions
+        if not checksums.get(resolution)
+        or checksums[resolution] != get_rendition_checksum(os.path.join(output_base, resolution))
+    ]
+
+
+def clear_renditions(output_base, resolutions):
+    """Remove partial or corrupt output before re-encoding renditions."""
+    for resolution in resolutions:
+        shutil.rmtree(os.path.join(output_base, resolution), ignore_errors=True)
+
+
+def record_renditions(video_pk, resolutions):
+    """Mark renditions done and store checksums of their output."""
+    from .models import VideoRendition
+    output_base = get_output_base(video_pk)
+    for resolution in resolutions:
+        output_dir = os.path.join(output_base, resolution)
+        VideoRendition.objects.update_or_create(
+            video_id=video_pk, resolution=resolution,
+            defaults={
+                'status': 'done', 'checksum': get_rendition_checksum(output_dir), 'progress': 100,
+                'finished_at': timezone.now(), 'size_bytes': get_directory_size(output_dir),
+            },
+        )
+
+
+def get_directory_size(path):
+    """Return total size in bytes of the files in a directory."""
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+def probe_video(video):
+    """Probe source once and store its properties on the video."""
+    if video.height is None:
+        data = probe_source(video.video_file.path)
+        type(video).objects.filter(pk=video.pk).update(**data)
+        for field, value in data.items():
+            setattr(video, field, value)
+    return get_probe(video)
+
+
+def get_probe(video):
+    """Return stored source properties of a video as dict."""
+    return {field: getattr(video, field) for field in PROBE_FIELDS}
+
+
+def encode_renditions(source_path, output_base, resolutions, probe, video_pk=None):
+    """Encode renditions in one pass or with one FFMPEG run each."""
     os.makedirs(output_base, exist_ok=True)
-    resolutions = ['480p', '720p', '1080p']
+    if use_chunked_encoding(probe):
+        with encoding_pass(video_pk, resolutions, probe) as progress:
+            convert_chunked(source_path, output_base, resolutions, probe, progress)
+        return
+    if settings.HLS_SINGLE_PASS:
+        with encoding_pass(video_pk, resolutions, probe) as progress:
+            convert_all_resolutions(source_path, output_base, resolutions, probe, progress)
+        return
     for resolution in resolutions:
-        convert_resolution(source_path, output_base, resolution)
+        with encoding_pass(video_pk, [resolution], probe) as progress:
+            convert_resolution(source_path, output_base, resolution, probe, progress)
+
 
+@contextmanager
+def encoding_pass(video_pk, resolutions, probe):
+    """Track status, progress and timing of renditions written by one FFMPEG pass."""
+    if video_pk is None:
+        yield None
+        return
+    set_rendition_status(video_pk, resolutions, 'encoding')
+    yield RenditionProgress(video_pk, resolutions, probe.get('duration'))
+    record_renditions(video_pk, resolutions)
 
-def convert_resolution(source_path, output_base, resolution):
+
+def enqueue_renditions(video_pk, resolutions):
+    """Fan out one job per rendition and fan in with a finalizer job."""
+    queue = get_transcode_queue()
+    retry = Retry(max=settings.HLS_RENDITION_RETRIES, interval=[30, 120, 300])
+    jobs = [
+        queue.enqueue(
+            'videos.tasks.convert_rendition', video_pk, resolution, retry=retry,
+            at_front=settings.HLS_PROGRESSIVE and i == 0,
+        )
+        for i, resolution in enumerate(resolutions)
+    ]
+    return queue.enqueue('videos.tasks.finalize_hls', video_pk, depends_on=jobs)
+
+
+def convert_rendition(video_pk, resolution):
+    """Convert a single rendition unless it is already intact, and record it."""
+    from .models import Video
+    if not get_missing_renditions(video_pk, [resolution]):
+        return
+    video = Video.objects.get(pk=video_pk)
+    output_base = get_output_base(video_pk)
+    set_video_status(video_pk, 'encoding')
+    try:
+        clear_renditions(output_base, [resolution])
+        encode_renditions(video.video_file.path, output_base, [resolution], get_probe(video), video_pk)
+    except Exception as error:
+        fail_renditions(video_pk, [resolution])
+        set_video_status(video_pk, 'failed', error=describe_error(error))
+        raise
+
+
+def finalize_hls(video_pk):
+    """Mark video as fully converted once every rendition is done."""
+    from .models import Video, VideoRendition
+    unfinished = VideoRendition.objects.filter(video_id=video_pk).exclude(status='done')
+    if unfinished.exists():
+        return False
+    Video.objects.filter(pk=video_pk).update(hls_completed_at=timezone.now())
+    set_video_status(video_pk, 'ready', error='')
+    return True
+
+
+def fail_renditions(video_pk, resolutions):
+    """Mark renditions that did not finish as failed."""
+    from .models import VideoRendition
+    VideoRendition.objects.filter(
+        video_id=video_pk, resolution__in=resolutions
+    ).exclude(status='done').update(status='failed')
+
+
+def set_rendition_status(video_pk, resolutions, status):
+    """Create or update rendition status rows for a video."""
+    from .models import VideoRendition
+    defaults = {'status': status}
+    if status == 'encoding':
+        defaults.update(progress=0, encode_speed=None, started_at=timezone.now(), finished_at=None)
+    for resolution in resolutions:
+        VideoRendition.objects.update_or_create(
+            video_id=video_pk, resolution=resolution, defaults=defaults
+        )
+
+
+def convert_resolution(source_path, output_base, resolution, probe=None, on_progress=None):
     """Convert video to specific resolution."""
+    probe = probe or {}
     output_dir = os.path.join(output_base, resolution)
     os.makedirs(output_dir, exist_ok=True)
-    scale = get_scale_filter(resolution)
+    video_args = get_video_args(resolution, probe)
+    if not can_copy_video(resolution, probe):
+        video_args = ['-vf', get_scale_filter(resolution, probe)] + video_args
     output_path = os.path.join(output_dir, 'index.m3u8')
-    cmd = build_ffmpeg_command(source_path, output_path, scale)
-    subprocess.run(cmd, check=True)
+    cmd = build_ffmpeg_command(source_path, output_path, video_args, get_audio_args(probe))
+    run_ffmpeg(cmd, on_progress)
+
+
+def convert_all_resolutions(source_path, output_base, resolutions, probe=None, on_progress=None):
+    """Decode source once and write every resolution in one FFMPEG run."""
+    for resolution in resolutions:
+        os.makedirs(os.path.join(output_base, resolution), exist_ok=True)
+    cmd = build_multi_ffmpeg_command(source_path, output_base, resolutions, probe or {})
+    run_ffmpeg(cmd, on_progress)
+
+
+def build_ladder(probe):
+    """Return resolutions to encode without upscaling the source."""
+    height = probe.get('height')
+    if not height:
+        return list(RESOLUTIONS)
+    ladder = [resolution for resolution in RESOLUTIONS if LADDER[resolution]['height'] <= height]
+    return ladder or RESOLUTIONS[:1]
+
+
+def get_target_height(resolution, probe):
+    """Return output height for resolution, never above the source."""
+    height = LADDER.get(resolution, LADDER['480p'])['height']
+    return min(height, probe.get('height') or height)
+
+
+def get_max_bitrate(resolution, probe):
+    """Return bitrate cap for resolution relative to the source bitrate."""
+    nominal = LADDER.get(resolution, LADDER['480p'])['bitrate']
+    if not probe.get('bitrate') or not probe.get('height'):
+        return nominal
+    ratio = min(1.0, get_target_height(resolution, probe) / probe['height']) ** 2
+    return min(nominal, int(probe['bitrate'] * ratio))
+
 
+def can_copy_video(resolution, probe):
+    """Return True if source video is 8-bit 4:2:0 Main/High H.264 with short GOPs at the rendition size."""
+    return (
+        probe.get('video_codec') == 'h264'
+        and probe.get('profile') in COPY_PROFILES
+        and probe.get('pix_fmt') in COPY_PIX_FMTS
+        and bool(probe.get('keyframe_interval'))
+        and probe['keyframe_interval'] <= MAX_COPY_KEYFRAME_INTERVAL
+        and probe.get('height') == LADDER.get(resolution, {}).get('height')
+        and bool(probe.get('bitrate'))
+        and probe['bitrate'] <= LADDER[resolution]['bitrate']
+    )
 
-def get_scale_filter(resolution):
+
+def get_video_args(resolution, probe, stream=None):
+    """Return FFMPEG video codec arguments for one rendition."""
+    suffix = '' if stream is None else f':{stream}'
+    if can_copy_video(resolution, probe):
+        return [f'-c:v{suffix}', 'copy']
+    maxrate = get_max_bitrate(resolution, probe)
+    return [
+        f'-c:v{suffix}', 'libx264',
+        f'-maxrate:v{suffix}', str(maxrate),
+        f'-bufsize:v{suffix}', str(maxrate * 2),
+    ]
+
+
+def get_audio_args(probe):
+    """Return FFMPEG audio codec arguments, copying AAC sources."""
+    return ['-c:a', 'copy' if probe.get('audio_codec') == 'aac' else 'aac']
+
+
+def get_scale_filter(resolution, probe=None):
     """Return FFMPEG scale filter for resolution."""
-    scale_map = {
-        '480p': 'scale=-2:480',
-        '720p': 'scale=-2:720',
-        '1080p': 'scale=-2:1080',
-    }
-    return scale_map.get(resolution, 'scale=-2:480')
+    return f'scale=-2:{get_target_height(resolution, probe or {})}'
+
+
+def get_hls_options():
+    """Return HLS muxer options, using growing EVENT playlists if progressive."""
+    options = [('start_number', '0'), ('hls_time', '10'), ('hls_list_size', '0')]
+    if settings.HLS_PROGRESSIVE:
+        options += [('hls_playlist_type', 'event'), ('hls_flags', 'temp_file')]
+    return options
+
 
+def get_thread_args(parallel=1):
+    """Return FFMPEG thread limit sharing the worker's CPU budget between processes."""
+    budget = settings.HLS_FFMPEG_THREADS
+    if not budget and parallel > 1:
+        budget = os.cpu_count() or 1
+    if not budget:
+        return []
+    return ['-threads', str(max(1, budget // parallel))]
 
-def build_ffmpeg_command(source, output, scale):
+
+def build_ffmpeg_command(source, output, video_args, audio_args):
     """Build FFMPEG command for HLS conversion."""
+    hls_args = []
+    for key, value in get_hls_options():
+        hls_args += [f'-{key}', value]
     return [
         'ffmpeg', '-i', source,
-        '-vf', scale,
-        '-c:v', 'libx264',
-        '-c:a', 'aac',
-        '-start_number', '0',
-        '-hls_time', '10',
-        '-hls_list_size', '0',
+        *video_args,
+        *audio_args,
+        *get_thread_args(),
+        *hls_args,
         '-f', 'hls',
         output
     ]
+
+
+def build_filter_graph(resolutions, probe):
+    """Build split/scale filter graph for renditions that are re-encoded."""
+    encoded = [resolution for resolution in resolutions if not can_copy_video(resolution, probe)]
+    if not encoded:
+        return None
+    labels = ''.join(f'[s{i}]' for i in range(len(encoded)))
+    chains = [f'[0:v]split={len(encoded)}{labels}']
+    for i, resolution in enumerate(encoded):
+        chains.append(f'[s{i}]{get_scale_filter(resolution, probe)}[v{i}]')
+    return ';'.join(chains)
+
+
+def build_stream_args(resolutions, probe):
+    """Build map and codec arguments with one video stream per rendition."""
+    maps, codecs, encoded = [], [], 0
+    for i, resolution in enumerate(resolutions):
+        if can_copy_video(resolution, probe):
+            maps += ['-map', '0:v:0']
+        else:
+            maps += ['-map', f'[v{encoded}]']
+            encoded += 1
+        codecs += get_video_args(resolution, probe, i)
+    return maps + ['-map', '0:a?'] + codecs
+
+
+def build_tee_outputs(output_base, resolutions):
+    """Build tee muxer target list sharing one encoded audio stream."""
+    hls_options = ':'.join(f'{key}={value}' for key, value in get_hls_options())
+    outputs = []
+    for i, resolution in enumerate(resolutions):
+        path = os.path.join(output_base, resolution, 'index.m3u8')
+        options = f"select=\\'v:{i},a\\':f=hls:{hls_options}"
+        outputs.append(f'[{options}]{path}')
+    return '|'.join(outputs)
+
+
+def build_multi_ffmpeg_command(source, output_base, resolutions, probe, offset=0, parallel=1):
+    """Build single-decode FFMPEG command writing all resolutions."""
+    graph = build_filter_graph(resolutions, probe)
+    cmd = ['ffmpeg', '-i', source]
+    if graph:
+        cmd += ['-filter_complex', graph]
+    return cmd + [
+        *build_stream_args(resolutions, probe),
+        *get_audio_args(probe),
+        *get_thread_args(parallel),
+        '-output_ts_offset', str(offset),
+        '-f', 'tee',
+        build_tee_outputs(output_base, resolutions)
+    ]
@@ -1,3 +1,740 @@
-from django.test import TestCase
+import hashlib
+import io
+import os
+import shutil
+import tempfile
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from unittest import mock, skipUnless
+from urllib.parse import parse_qs
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.exceptions import ValidationError
+from django.core.management.base import CommandError
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone as django_timezone
+from django.utils.http import http_date
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from .catalog import render_catalog
+from .management.commands.ingest import build_videos, find_conflicts, get_media_name, import_file
+from .chunking import stitch_chunk, write_playlist
+from .models import Upload, Video
+from .probe import get_keyframe_interval
+from .progress import RenditionProgress, parse_progress
+from .serializers import VideoSerializer
+from .signing import (
+    build_segment_query, get_expiry, limit_cache_control, sign, sign_manifest, verify_segment_query
+)
+from .tasks import can_copy_video, get_output_base, process_video, record_renditions
+from .uploads import UPLOAD_CONTENT_TYPE, create_upload_file, get_absolute_path, upload_hashers, write_chunk
+from .utils import (
+    SEGMENT_CONTENT_TYPE, HotFile, HotFileCache, RangeFile, RangeNotSatisfiable, get_requested_range, parse_range,
+    serve_file
+)
 
-# Create your tests here.
+try:
+    import fakeredis
+    import lupa  # noqa: F401
+except ImportError:
+    fakeredis = None
+
+LOCAL_CACHES = {'default': {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}
+
+if fakeredis:
+    FAKE_REDIS_CACHES = {
+        'default': {
+            'BACKEND': 'django_redis.cache.RedisCache',
+            'LOCATION': 'redis://fakeredis:6379/1',
+            'OPTIONS': {'CONNECTION_POOL_KWARGS': {'connection_class': fakeredis.FakeConnection}},
+        }
+    }
+else:
+    FAKE_REDIS_CACHES = LOCAL_CACHES
+
+ETAG = '"1-2-3"'
+LAST_MODIFIED = 1700000000
+
+
+class ParseRangeTests(SimpleTestCase):
+    """RFC 7233 single byte-range parsing."""
+
+    def test_closed_range(self):
+        self.assertEqual(parse_range('bytes=0-99', 1000), (0, 99))
+
+    def test_end_clamped_to_size(self):
+        self.assertEqual(parse_range('bytes=900-5000', 1000), (900, 999))
+
+    def test_open_ended_range(self):
+        self.assertEqual(parse_range('bytes=100-', 1000), (100, 999))
+
+    def test_suffix_range(self):
+        self.assertEqual(parse_range('bytes=-100', 1000), (900, 999))
+
+    def test_suffix_longer_than_file(self):
+        self.assertEqual(parse_range('bytes=-5000', 1000), (0, 999))
+
+    def test_zero_suffix_not_satisfiable(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=-0', 1000)
+
+    def test_start_beyond_end_not_satisfiable(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            parse_range('bytes=1000-', 1000)
+
+    def test_multi_range_ignored(self):
+        self.assertIsNone(parse_range('bytes=0-9,20-29', 1000))
+
+    def test_invalid_forms_ignored(self):
+        for header in ['bytes=-', 'bytes=9-0', 'items=0-9', 'bytes=a-b']:
+            with self.subTest(header=header):
+                self.assertIsNone(parse_range(header, 1000))
+
+
+class RequestedRangeTests(SimpleTestCase):
+    """Range and If-Range headers of a request."""
+
+    def get_range(self, **headers):
+        request = RequestFactory().get('/', headers=headers)
+        return get_requested_range(request, 1000, ETAG, LAST_MODIFIED)
+
+    def test_no_range(self):
+        self.assertIsNone(self.get_range())
+
+    def test_if_range_etag_match(self):
+        self.assertEqual(self.get_range(Range='bytes=0-9', If_Range=ETAG), (0, 9))
+
+    def test_if_range_etag_mismatch(self):
+        self.assertIsNone(self.get_range(Range='bytes=0-9', If_Range='"other"'))
+
+    def test_if_range_date_match(self):
+        self.assertEqual(self.get_range(Range='bytes=0-9', If_Range=http_date(LAST_MODIFIED)), (0, 9))
+
+    def test_if_range_date_mismatch(self):
+        self.assertIsNone(self.get_range(Range='bytes=0-9', If_Range=http_date(LAST_MODIFIED - 60)))
+
+    def test_unsatisfiable_raises(self):
+        with self.assertRaises(RangeNotSatisfiable):
+            self.get_range(Range='bytes=2000-')
+
+
+class RangeFileTests(SimpleTestCase):
+    """Reads limited to a byte range."""
+
+    def test_reads_stop_at_range_end(self):
+        handle = io.BytesIO(b'0123456789')
+        handle.seek(2)
+        range_file = RangeFile(handle, 5)
+        self.assertEqual(range_file.read(3), b'234')
+        self.assertEqual(range_file.read(), b'56')
+        self.assertEqual(range_file.read(), b'')
+
+
+@override_settings(HLS_OFFLOAD='')
+class ServeFileRangeTests(SimpleTestCase):
+    """Range responses of serve_file."""
+
+    def setUp(self):
+        handle, self.path = tempfile.mkstemp()
+        os.write(handle, b'0123456789')
+        os.close(handle)
+        self.addCleanup(os.remove, self.path)
+
+    def serve(self, **headers):
+        request = RequestFactory().get('/', headers=headers)
+        response = serve_file(request, self.path, SEGMENT_CONTENT_TYPE, {'max_age': 60})
+        self.addCleanup(response.close)
+        return response
+
+    def test_partial_content(self):
+        response = self.serve(Range='bytes=-3')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 7-9/10')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+
+    def test_not_satisfiable(self):
+        response = self.serve(Range='bytes=10-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_if_range_mismatch_sends_full_file(self):
+        response = self.serve(Range='bytes=0-1', If_Range='"stale"')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'0123456789')
+
+
+@override_settings(HLS_SIGNED_URL_TTL=3600)
+class SigningTests(SimpleTestCase):
+    """Signed segment URLs."""
+
+    def get_params(self, user_id=7, movie_id=3, resolution='720p'):
+        return {key: values[0] for key, values in parse_qs(build_segment_query(user_id, movie_id, resolution)).items()}
+
+    def test_round_trip(self):
+        self.assertTrue(verify_segment_query(self.get_params(), 3, '720p'))
+
+    def test_expiry_bucketed(self):
+        self.assertEqual(get_expiry(7200), 14400)
+        self.assertEqual(get_expiry(10799), 14400)
+        self.assertEqual(get_expiry(10800), 18000)
+
+    def test_expired(self):
+        params = self.get_params()
+        with mock.patch('videos.signing.time.time', return_value=int(params['e']) + 1):
+            self.assertFalse(verify_segment_query(params, 3, '720p'))
+
+    def test_other_movie_or_resolution_rejected(self):
+        params = self.get_params()
+        self.assertFalse(verify_segment_query(params, 4, '720p'))
+        self.assertFalse(verify_segment_query(params, 3, '1080p'))
+
+    def test_tampered_params_rejected(self):
+        params = self.get_params()
+        expires = int(params['e'])
+        for key, value in [('u', '8'), ('e', str(expires + 3600)), ('s', '0' * 64)]:
+            with self.subTest(key=key):
+                self.assertFalse(verify_segment_query({**params, key: value}, 3, '720p'))
+
+    def test_resigned_for_other_user_rejected(self):
+        params = self.get_params()
+        params['s'] = sign(8, 3, '720p', int(params['e']))
+        self.assertFalse(verify_segment_query(params, 3, '720p'))
+
+    def test_missing_or_invalid_params_rejected(self):
+        params = self.get_params()
+        self.assertFalse(verify_segment_query({'u': params['u'], 'e': params['e']}, 3, '720p'))
+        self.assertFalse(verify_segment_query({**params, 'u': 'x'}, 3, '720p'))
+
+    def test_sign_manifest_only_touches_uris(self):
+        content = '#EXTM3U\n#EXTINF:10.0,\nindex0.ts\n#EXT-X-ENDLIST\n'
+        self.assertEqual(
+            sign_manifest(content, 'u=1'), '#EXTM3U\n#EXTINF:10.0,\nindex0.ts/?u=1\n#EXT-X-ENDLIST\n'
+        )
+
+    def test_cache_lifetime_capped_at_expiry(self):
+        with mock.patch('videos.signing.time.time', return_value=1000):
+            cache_control = limit_cache_control({'public': True, 'max_age': 31536000}, 1600)
+        self.assertEqual(cache_control, {'public': True, 'max_age': 600, 's_maxage': 600})
+
+
+def fake_stat(mtime_ns, size=300):
+    return SimpleNamespace(st_ino=1, st_mtime_ns=mtime_ns, st_mtime=mtime_ns / 1e9, st_size=size)
+
+
+@override_settings(HLS_HOT_CACHE_BYTES=1000)
+class HotFileCacheTests(SimpleTestCase):
+    """In-process cache of manifests and leading segments."""
+
+    def setUp(self):
+        self.cache = HotFileCache()
+
+    def put(self, name, mtime_ns, data=b'x' * 300):
+        self.cache.put((1, '480p', name), HotFile(data, fake_stat(mtime_ns, len(data))))
+
+    def test_least_recently_used_evicted(self):
+        for i in range(3):
+            self.put(str(i), i)
+        self.cache.get((1, '480p', '0'), 60)
+        self.put('3', 3)
+        self.assertEqual([key[2] for key in self.cache.entries], ['2', '0', '3'])
+        self.assertEqual(self.cache.size, 900)
+
+    def test_new_mtime_replaces_old_version(self):
+        self.put('0', 1, b'old')
+        self.put('0', 2, b'new')
+        self.assertIsNone(self.cache.lookup((1, '480p', '0'), fake_stat(1, 3)))
+        self.assertEqual(self.cache.lookup((1, '480p', '0'), fake_stat(2, 3)).data, b'new')
+        self.assertEqual(self.cache.get((1, '480p', '0'), 60).data, b'new')
+        self.assertEqual(self.cache.size, 3)
+
+    def test_stale_entry_needs_check(self):
+        self.put('index.m3u8', 1)
+        self.assertIsNone(self.cache.get((1, '480p', 'index.m3u8'), 0))
+
+
+def write_chunk_output(chunk_dir, segments):
+    """Write a chunk's media playlist and segments as FFMPEG would."""
+    os.makedirs(chunk_dir)
+    lines = ['#EXTM3U']
+    for i, (duration, data) in enumerate(segments):
+        lines += [f'#EXTINF:{duration},', f'index{i}.ts']
+        with open(os.path.join(chunk_dir, f'index{i}.ts'), 'wb') as handle:
+            handle.write(data)
+    with open(os.path.join(chunk_dir, 'index.m3u8'), 'w') as handle:
+        handle.write('\n'.join(lines + ['#EXT-X-ENDLIST']) + '\n')
+
+
+class ChunkStitchTests(SimpleTestCase):
+    """Stitching chunk playlists into one rendition playlist."""
+
+    def setUp(self):
+        self.work_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.work_dir)
+        self.output_dir = os.path.join(self.work_dir, 'out')
+        self.entries = []
+
+    def stitch(self, index, segments):
+        chunk_dir = os.path.join(self.work_dir, str(index), '480p')
+        write_chunk_output(chunk_dir, segments)
+        stitch_chunk(chunk_dir, self.output_dir, '480p', self.entries)
+
+    def read_segment(self, name):
+        with open(os.path.join(self.output_dir, '480p', name), 'rb') as handle:
+            return handle.read()
+
+    def test_segments_numbered_across_chunks(self):
+        self.stitch(0, [(4.0, b'a'), (4.0, b'b')])
+        self.stitch(1, [(4.0, b'c')])
+        self.assertEqual(
+            self.entries, [(4.0, 'index0.ts', False), (4.0, 'index1.ts', False), (4.0, 'index2.ts', True)]
+        )
+        self.assertEqual(self.read_segment('index2.ts'), b'c')
+
+    def test_short_tail_appended_to_previous_segment(self):
+        self.stitch(0, [(4.0, b'a'), (0.5, b'b')])
+        self.assertEqual(self.entries, [(4.5, 'index0.ts', False)])
+        self.assertEqual(self.read_segment('index0.ts'), b'ab')
+
+    def test_short_first_segment_of_chunk_kept(self):
+        self.stitch(0, [(4.0, b'a')])
+        self.stitch(1, [(0.5, b'b'), (0.4, b'c')])
+        self.assertEqual(self.entries, [(4.0, 'index0.ts', False), (0.9, 'index1.ts', True)])
+        self.assertEqual(self.read_segment('index1.ts'), b'bc')
+
+    @override_settings(HLS_PROGRESSIVE=False)
+    def test_playlist_marks_discontinuities(self):
+        path = os.path.join(self.work_dir, 'index.m3u8')
+        write_playlist(path, [(4.0, 'index0.ts', False), (4.5, 'index1.ts', True)])
+        with open(path) as handle:
+            self.assertEqual(handle.read().splitlines(), [
+                '#EXTM3U', '#EXT-X-VERSION:3', '#EXT-X-TARGETDURATION:5', '#EXT-X-MEDIA-SEQUENCE:0',
+                '#EXTINF:4.000000,', 'index0.ts',
+                '#EXT-X-DISCONTINUITY', '#EXTINF:4.500000,', 'index1.ts',
+                '#EXT-X-ENDLIST'
+            ])
+
+    @override_settings(HLS_PROGRESSIVE=True)
+    def test_growing_playlist_is_open_event(self):
+        path = os.path.join(self.work_dir, 'index.m3u8')
+        write_playlist(path, [(4.0, 'index0.ts', False)], ended=False)
+        with open(path) as handle:
+            lines = handle.read().splitlines()
+        self.assertIn('#EXT-X-PLAYLIST-TYPE:EVENT', lines)
+        self.assertNotIn('#EXT-X-ENDLIST', lines)
+
+
+COPYABLE_SOURCE = {
+    'video_codec': 'h264', 'profile': 'High', 'pix_fmt': 'yuv420p', 'keyframe_interval': 2.0,
+    'height': 720, 'bitrate': 2000000,
+}
+
+
+class CopyVideoTests(SimpleTestCase):
+    """Stream copy of sources that already match a rendition."""
+
+    def test_matching_source_copied(self):
+        self.assertTrue(can_copy_video('720p', COPYABLE_SOURCE))
+
+    def test_other_size_or_higher_bitrate_encoded(self):
+        self.assertFalse(can_copy_video('480p', COPYABLE_SOURCE))
+        self.assertFalse(can_copy_video('720p', {**COPYABLE_SOURCE, 'bitrate': 9000000}))
+
+    def test_incompatible_sources_encoded(self):
+        for field, value in [
+            ('pix_fmt', 'yuv420p10le'), ('pix_fmt', 'yuv422p'), ('pix_fmt', 'yuv444p'), ('pix_fmt', ''),
+            ('profile', 'High 10'), ('profile', 'High 4:2:2'), ('profile', ''),
+            ('keyframe_interval', 8.0), ('keyframe_interval', None),
+        ]:
+            with self.subTest(field=field, value=value):
+                self.assertFalse(can_copy_video('720p', {**COPYABLE_SOURCE, field: value}))
+
+    def test_keyframe_interval_is_longest_gap(self):
+        self.assertEqual(get_keyframe_interval([0.0, 2.0, 4.0, 9.5, 11.5]), 5.5)
+        self.assertIsNone(get_keyframe_interval([0.0]))
+
+
+def create_video(title='Video', category='drama', created_at=None, status='ready', **fields):
+    """Create a converted video row without touching media files."""
+    video = Video.objects.create(
+        title=title, description='', video_file=f'videos/{title}.mp4', thumbnail=f'thumbnails/{title}.jpg',
+        category=category, status=status, **fields
+    )
+    if created_at:
+        Video.objects.filter(pk=video.pk).update(created_at=created_at)
+    return video
+
+
+@override_settings(CACHES=LOCAL_CACHES, VIDEO_PAGE_SIZE=2, VIDEO_MAX_PAGE_SIZE=3)
+class VideoCursorPaginationTests(TestCase):
+    """Keyset pages of the video list."""
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('user@example.com'))
+
+    def get_page(self, url='/api/video/', **params):
+        response = self.client.get(url, params)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def get_ids(self, page):
+        return [video['id'] for video in page['results']]
+
+    def test_equal_timestamps_split_by_id(self):
+        created_at = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        videos = [create_video(f'v{i}', created_at=created_at) for i in range(3)]
+        older = create_video('old', created_at=datetime(2025, 1, 1, tzinfo=timezone.utc))
+        first = self.get_page(page_size=2)
+        self.assertEqual(self.get_ids(first), [videos[2].pk, videos[1].pk])
+        second = self.get_page(first['next'])
+        self.assertEqual(self.get_ids(second), [videos[0].pk, older.pk])
+        self.assertIsNone(second['next'])
+
+    def test_invalid_cursor_not_found(self):
+        for cursor in ['!!!', 'bm90LWEtY3Vyc29y', 'MjAyNi0wMS0wMXxhYmM=', '//79']:
+            with self.subTest(cursor=cursor):
+                self.assertEqual(self.client.get('/api/video/', {'cursor': cursor}).status_code, 404)
+
+    def test_page_size_clamped(self):
+        for i in range(5):
+            create_video(f'v{i}')
+        for page_size, expected in [('50', 3), ('0', 1), ('-3', 1), ('abc', 2)]:
+            with self.subTest(page_size=page_size):
+                self.assertEqual(len(self.get_page(page_size=page_size)['results']), expected)
+
+    def test_category_filter(self):
+        drama = create_video('drama', 'drama')
+        create_video('comedy', 'comedy')
+        create_video('pending', 'drama', status='pending')
+        page = self.get_page(category='drama')
+        self.assertEqual(self.get_ids(page), [drama.pk])
+        self.assertIsNone(page['next'])
+
+
+CATALOG_BASE_URL = 'http://testserver'
+
+
+class RenderCatalogTests(SimpleTestCase):
+    """Catalog fast path against VideoSerializer with JSONRenderer."""
+
+    def build_videos(self, created_at):
+        return [
+            Video(
+                id=1, created_at=created_at, title='Überraschung – 日本語 "quoted"',
+                description='line\u2028separator\u2029paragraph </script>', thumbnail='thumbnails/thumb 1 ä.jpg',
+                category='drama',
+            ),
+            Video(id=2, created_at=created_at, title='No thumbnail', description='', thumbnail='', category='comedy'),
+        ]
+
+    def assert_same_bytes(self, created_at):
+        videos = self.build_videos(created_at)
+        rows = [(v.id, v.created_at, v.title, v.description, v.thumbnail.name, v.category) for v in videos]
+        serializer = VideoSerializer(videos, many=True, context={'base_url': CATALOG_BASE_URL})
+        expected = JSONRenderer().render(serializer.data)
+        self.assertEqual(render_catalog(rows, CATALOG_BASE_URL + '/media/'), expected)
+        return expected
+
+    def test_text_and_thumbnails_match_serializer(self):
+        body = self.assert_same_bytes(datetime(2026, 1, 2, 3, 4, 5, 678901, tzinfo=timezone.utc))
+        self.assertIn(b'\\u2028', body)
+        self.assertIn(b'"thumbnail_url":null', body)
+
+    def test_aware_timestamps_match_in_other_timezone(self):
+        with django_timezone.override('Europe/Berlin'):
+            self.assert_same_bytes(datetime(2026, 7, 1, 12, 0, tzinfo=timezone.utc))
+
+    def test_naive_timestamps_match(self):
+        with django_timezone.override('Europe/Berlin'):
+            self.assert_same_bytes(datetime(2026, 7, 1, 12, 0))
+
+    @override_settings(USE_TZ=False)
+    def test_timestamps_match_without_time_zone_support(self):
+        self.assert_same_bytes(datetime(2026, 7, 1, 12, 0))
+        self.assert_same_bytes(datetime(2026, 7, 1, 12, 0, tzinfo=timezone.utc))
+
+
+@skipUnless(fakeredis, 'fakeredis with lupa is required for the upload lock')
+class ResumableUploadTests(TestCase):
+    """tus-style resumable uploads."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root, CACHES=FAKE_REDIS_CACHES))
+        self.enterContext(mock.patch.dict(upload_hashers))
+        self.data = bytes(range(256)) * 40
+        self.upload = Upload(filename='movie.mp4', file_path='videos/movie.mp4', size=len(self.data))
+        create_upload_file(self.upload)
+        self.upload.save()
+        self.url = f'/api/upload/{self.upload.pk}/'
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('admin@example.com', is_staff=True))
+
+    def patch(self, data, offset):
+        return self.client.patch(
+            self.url, data, content_type=UPLOAD_CONTENT_TYPE, headers={'Upload-Offset': str(offset)}
+        )
+
+    def read_file(self):
+        with open(get_absolute_path(self.upload), 'rb') as handle:
+            return handle.read()
+
+    def test_head_reports_committed_offset(self):
+        Upload.objects.filter(pk=self.upload.pk).update(offset=1000)
+        response = self.client.head(self.url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Upload-Offset'], '1000')
+        self.assertEqual(response['Upload-Length'], str(len(self.data)))
+        self.assertEqual(response['Tus-Resumable'], '1.0.0')
+
+    def test_patch_appends_and_commits_offset(self):
+        response = self.patch(self.data[:4000], 0)
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], '4000')
+        response = self.patch(self.data[4000:], 4000)
+        self.assertEqual(response['Upload-Offset'], str(len(self.data)))
+        self.upload.refresh_from_db()
+        self.assertEqual(self.read_file(), self.data)
+        self.assertEqual(self.upload.sha256, hashlib.sha256(self.data).hexdigest())
+
+    def test_patch_at_wrong_offset_conflicts(self):
+        self.patch(self.data[:4000], 0)
+        response = self.patch(self.data[100:200], 100)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '4000')
+        self.upload.refresh_from_db()
+        self.assertEqual(self.upload.offset, 4000)
+
+    def test_write_truncates_uncommitted_bytes(self):
+        with open(get_absolute_path(self.upload), 'wb') as handle:
+            handle.write(self.data[:1000] + b'partial chunk of a failed request')
+        self.upload.offset = 1000
+        self.assertEqual(write_chunk(self.upload, io.BytesIO(self.data[1000:2000]), 1000), 2000)
+        self.assertEqual(self.read_file(), self.data[:2000])
+
+    def test_hash_rebuilt_from_disk_without_cached_state(self):
+        self.upload.offset = write_chunk(self.upload, io.BytesIO(self.data[:3000]), 3000)
+        upload_hashers.clear()
+        write_chunk(self.upload, io.BytesIO(self.data[3000:]), len(self.data) - 3000)
+        self.assertEqual(self.upload.sha256, hashlib.sha256(self.data).hexdigest())
+
+    def test_hash_rebuilt_when_cached_state_is_stale(self):
+        self.upload.offset = write_chunk(self.upload, io.BytesIO(self.data[:3000]), 3000)
+        upload_hashers[self.upload.pk] = (2000, hashlib.sha256(b'other'))
+        write_chunk(self.upload, io.BytesIO(self.data[3000:]), len(self.data) - 3000)
+        self.assertEqual(self.upload.sha256, hashlib.sha256(self.data).hexdigest())
+
+    def test_complete_before_full_length_conflicts(self):
+        self.patch(self.data[:4000], 0)
+        response = self.client.post(f'{self.url}complete/', {'title': 'Movie', 'category': 'drama'})
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json(), {'error': 'Upload incomplete.', 'offset': 4000, 'size': len(self.data)})
+        self.assertFalse(Video.objects.exists())
+
+
+def write_rendition(video_pk, resolution, data=b'segment'):
+    """Write a minimal rendition as the encoder would."""
+    output_dir = os.path.join(get_output_base(video_pk), resolution)
+    os.makedirs(output_dir, exist_ok=True)
+    with open(os.path.join(output_dir, 'index.m3u8'), 'w') as handle:
+        handle.write('#EXTM3U\n#EXTINF:10.0,\nindex0.ts\n#EXT-X-ENDLIST\n')
+    with open(os.path.join(output_dir, 'index0.ts'), 'wb') as handle:
+        handle.write(data)
+
+
+def fake_encode(source_path, output_base, resolutions, probe, video_pk=None):
+    """Stand in for FFMPEG by writing and recording renditions."""
+    for resolution in resolutions:
+        write_rendition(video_pk, resolution, b'encoded')
+    record_renditions(video_pk, resolutions)
+
+
+@override_settings(HLS_FAN_OUT=False)
+class ProcessVideoReuseTests(TestCase):
+    """Donor reuse and per-rendition resume of conversions."""
+
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        self.enterContext(mock.patch('videos.tasks.invalidate_catalog'))
+        self.encode = self.enterContext(mock.patch('videos.tasks.encode_renditions', side_effect=fake_encode))
+
+    def create_source(self, title, **fields):
+        return create_video(title, status='pending', content_hash='a' * 64, height=720, **fields)
+
+    def test_identical_source_links_donor_output(self):
+        donor = self.create_source('donor', hls_completed_at=django_timezone.now())
+        for resolution in ['480p', '720p']:
+            write_rendition(donor.pk, resolution)
+        record_renditions(donor.pk, ['480p', '720p'])
+        video = self.create_source('copy')
+        process_video(video.pk)
+        self.encode.assert_not_called()
+        video.refresh_from_db()
+        self.assertEqual(video.status, 'ready')
+        donor_segment = os.path.join(get_output_base(donor.pk), '720p', 'index0.ts')
+        segment = os.path.join(get_output_base(video.pk), '720p', 'index0.ts')
+        self.assertTrue(os.path.samefile(segment, donor_segment))
+        self.assertEqual(
+            sorted(video.renditions.filter(status='done').values_list('resolution', flat=True)), ['480p', '720p']
+        )
+
+    def test_intact_rendition_skipped_on_retry(self):
+        video = self.create_source('retry')
+        write_rendition(video.pk, '480p')
+        record_renditions(video.pk, ['480p'])
+        process_video(video.pk)
+        self.assertEqual(self.encode.call_args.args[2], ['720p'])
+        with open(os.path.join(get_output_base(video.pk), '480p', 'index0.ts'), 'rb') as handle:
+            self.assertEqual(handle.read(), b'segment')
+
+    def test_rendition_with_wrong_checksum_encoded_again(self):
+        video = self.create_source('corrupt')
+        for resolution in ['480p', '720p']:
+            write_rendition(video.pk, resolution)
+        record_renditions(video.pk, ['480p', '720p'])
+        write_rendition(video.pk, '720p', b'truncated')
+        process_video(video.pk)
+        self.assertEqual(self.encode.call_args.args[2], ['720p'])
+        with open(os.path.join(get_output_base(video.pk), '720p', 'index0.ts'), 'rb') as handle:
+            self.assertEqual(handle.read(), b'encoded')
+        video.refresh_from_db()
+        self.assertEqual(video.status, 'ready')
+
+
+class IngestFileTests(SimpleTestCase):
+    """Storage names and file import of the ingest command."""
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        self.addCleanup(shutil.rmtree, media_root)
+        self.enterContext(override_settings(MEDIA_ROOT=media_root))
+        for name, data in [('a/trailer.mp4', b'first'), ('b/trailer.mp4', b'second'), ('thumb.jpg', b'jpg')]:
+            os.makedirs(os.path.dirname(os.path.join(self.directory, name)), exist_ok=True)
+            with open(os.path.join(self.directory, name), 'wb') as handle:
+                handle.write(data)
+
+    def row(self, file):
+        return {'file': file, 'title': file, 'description': '-', 'category': 'drama', 'thumbnail': 'thumb.jpg'}
+
+    def import_row(self, video, files):
+        for field, path in files.items():
+            import_file(path, getattr(video, field).name)
+
+    def test_names_keep_relative_path(self):
+        videos, errors = build_videos([self.row('a/trailer.mp4'), self.row('b/trailer.mp4')], self.directory)
+        self.assertEqual(errors, [])
+        names = [video.video_file.name for video, _ in videos]
+        self.assertEqual(names, ['videos/a/trailer.mp4', 'videos/b/trailer.mp4'])
+
+    def test_paths_outside_directory_rejected(self):
+        for path in ['../trailer.mp4', '/etc/passwd', 'a/../../trailer.mp4']:
+            with self.subTest(path=path), self.assertRaises(ValidationError):
+                get_media_name('videos', path)
+
+    def test_file_listed_twice_rejected(self):
+        videos, errors = build_videos([self.row('a/trailer.mp4'), self.row('a/./trailer.mp4')], self.directory)
+        self.assertEqual(len(videos), 1)
+        self.assertEqual(errors, ['Row 2: a/./trailer.mp4 is already listed in row 1.'])
+
+    def test_import_is_idempotent_for_identical_content(self):
+        videos, _ = build_videos([self.row('a/trailer.mp4')], self.directory)
+        self.import_row(*videos[0])
+        self.import_row(*videos[0])
+        self.assertEqual(find_conflicts(videos), [])
+
+    def test_different_content_never_overwritten(self):
+        videos, _ = build_videos([self.row('a/trailer.mp4')], self.directory)
+        target = os.path.join(settings.MEDIA_ROOT, 'videos', 'a', 'trailer.mp4')
+        os.makedirs(os.path.dirname(target))
+        with open(target, 'wb') as handle:
+            handle.write(b'other')
+        self.assertEqual(len(find_conflicts(videos)), 1)
+        with self.assertRaises(CommandError):
+            self.import_row(*videos[0])
+        with open(target, 'rb') as handle:
+            self.assertEqual(handle.read(), b'other')
+
+
+FFMPEG_PROGRESS = """frame=120
+fps=48.0
+out_time_us=5000000
+speed=2.5x
+progress=continue
+frame=240
+out_time_us=N/A
+speed=N/A
+progress=continue
+frame=300
+out_time_us=12500000
+speed=  3x
+progress=end
+"""
+
+
+class ParseProgressTests(SimpleTestCase):
+    """FFMPEG -progress output parsing."""
+
+    def test_blocks_parsed(self):
+        self.assertEqual(
+            list(parse_progress(io.StringIO(FFMPEG_PROGRESS))), [(5.0, 2.5), (0.0, None), (12.5, 3.0)]
+        )
+
+    def test_incomplete_block_ignored(self):
+        self.assertEqual(list(parse_progress(io.StringIO('out_time_us=1000000\nspeed=1x\n'))), [])
+
+
+class RenditionProgressTests(SimpleTestCase):
+    """Throttled progress writes of one encoding pass."""
+
+    def setUp(self):
+        self.now = 100.0
+        self.enterContext(mock.patch('videos.progress.time.monotonic', lambda: self.now))
+        self.write = self.enterContext(mock.patch.object(RenditionProgress, 'write'))
+        self.invalidate = self.enterContext(mock.patch('videos.catalog.invalidate_catalog'))
+        self.progress = RenditionProgress(1, ['480p', '720p'], 200.0)
+
+    def report(self, seconds, after=0.0):
+        self.now += after
+        self.progress(seconds, 1.5)
+
+    def test_writes_throttled(self):
+        self.report(10)
+        self.report(11, after=1.9)
+        self.report(12, after=0.1)
+        self.assertEqual(self.write.call_args_list, [mock.call(5.0, 1.5), mock.call(6.0, 1.5)])
+
+    def test_percent_capped(self):
+        self.report(250)
+        self.write.assert_called_once_with(100.0, 1.5)
+
+    @override_settings(HLS_PROGRESSIVE=True)
+    def test_catalog_invalidated_once_output_exists(self):
+        self.report(0)
+        self.invalidate.assert_not_called()
+        for _ in range(3):
+            self.report(20, after=2)
+        self.invalidate.assert_called_once_with()
+
+    @override_settings(HLS_PROGRESSIVE=False)
+    def test_catalog_untouched_without_progressive(self):
+        self.report(20)
+        self.invalidate.assert_not_called()
+
+
+class RenditionProgressWriteTests(TestCase):
+    """Progress stored on the rendition rows of one pass."""
+
+    def test_only_pass_renditions_updated(self):
+        video = create_video(status='encoding')
+        for resolution in ['480p', '720p', '1080p']:
+            video.renditions.create(resolution=resolution, status='encoding')
+        RenditionProgress(video.pk, ['480p', '720p'], 200.0).write(42.5, 1.2)
+        self.assertEqual(
+            sorted(video.renditions.values_list('resolution', 'progress', 'encode_speed', 'status')),
+            [('1080p', 0.0, None, 'encoding'), ('480p', 42.5, 1.2, 'encoding'), ('720p', 42.5, 1.2, 'encoding')]
+        )
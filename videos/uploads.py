@@ -0,0 +1,100 @@
+"""Resumable video uploads following the tus protocol."""
+import base64
+import binascii
+import hashlib
+import os
+from django.conf import settings
+from django.utils.text import get_valid_filename
+
+TUS_VERSION = '1.0.0'
+UPLOAD_CONTENT_TYPE = 'application/offset+octet-stream'
+BLOCK_SIZE = 1024 * 1024
+MAX_HASHERS = 64
+
+upload_hashers = {}
+
+
+def parse_metadata(header):
+    """Decode tus Upload-Metadata header into a dict of strings."""
+    metadata = {}
+    for pair in filter(None, (part.strip() for part in header.split(','))):
+        key, _, value = pair.partition(' ')
+        try:
+            metadata[key] = base64.b64decode(value, validate=True).decode()
+        except (binascii.Error, UnicodeDecodeError):
+            raise ValueError(f'Invalid metadata value for {key}.')
+    return metadata
+
+
+def get_upload_path(upload_id, filename):
+    """Return storage name of the final video file for an upload."""
+    extension = os.path.splitext(get_valid_filename(filename))[1].lower()
+    return f'videos/{upload_id}{extension}'
+
+
+def get_absolute_path(upload):
+    """Return filesystem path of an upload's file."""
+    return os.path.join(settings.MEDIA_ROOT, upload.file_path)
+
+
+def create_upload_file(upload):
+    """Create the empty target file for a new upload."""
+    path = get_absolute_path(upload)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    open(path, 'xb').close()
+
+
+def get_hasher(upload):
+    """Return SHA-256 state at the committed offset, rehashing the file if needed."""
+    offset, hasher = upload_hashers.pop(upload.pk, (None, None))
+    if offset != upload.offset:
+        hasher = hashlib.sha256()
+        with open(get_absolute_path(upload), 'rb') as handle:
+            remaining = upload.offset
+            while remaining:
+                block = handle.read(min(BLOCK_SIZE, remaining))
+                if not block:
+                    raise ValueError('Upload file is shorter than its offset.')
+                hasher.update(block)
+                remaining -= len(block)
+    return hasher
+
+
+def remember_hasher(upload_pk, offset, hasher):
+    """Keep hash state of an unfinished upload for its next chunk."""
+    upload_hashers[upload_pk] = (offset, hasher)
+    while len(upload_hashers) > MAX_HASHERS:
+        upload_hashers.pop(next(iter(upload_hashers)))
+
+
+def write_chunk(upload, stream, length):
+    """Append up to length bytes from stream at the committed offset and return new offset."""
+    hasher = get_hasher(upload)
+    offset = upload.offset
+    with open(get_absolute_path(upload), 'r+b') as handle:
+        handle.seek(offset)
+        handle.truncate()
+        while length:
+            try:
+                block = stream.read(min(BLOCK_SIZE, length))
+            except OSError:
+                break
+            if not block:
+                break
+            handle.write(block)
+            hasher.update(block)
+            offset += len(block)
+            length -= len(block)
+    if offset == upload.size:
+        upload.sha256 = hasher.hexdigest()
+    else:
+        remember_hasher(upload.pk, offset, hasher)
+    return offset
+
+
+def delete_upload_file(upload):
+    """Remove an abandoned upload's file and hash state."""
+    upload_hashers.pop(upload.pk, None)
+    path = get_absolute_path(upload)
+    if os.path.exists(path):
+        os.remove(path)
@@ -1,9 +1,22 @@
 """URL configuration for video streaming."""
+from django.conf import settings
 from django.urls import path
-from .views import video_list_view, video_manifest_view, video_segment_view
+from .views import (
+    upload_complete_view, upload_create_view, upload_detail_view,
+    video_list_view, video_manifest_async_view, video_manifest_view, video_segment_async_view,
+    video_segment_view
+)
+
+if settings.HLS_ASYNC:
+    manifest_view, segment_view = video_manifest_async_view, video_segment_async_view
+else:
+    manifest_view, segment_view = video_manifest_view, video_segment_view
 
 urlpatterns = [
     path('video/', video_list_view, name='video_list'),
-    path('video/<int:movie_id>/<str:resolution>/index.m3u8', video_manifest_view, name='video_manifest'),
-    path('video/<int:movie_id>/<str:resolution>/<str:segment>/', video_segment_view, name='video_segment'),
+    path('video/<int:movie_id>/<str:resolution>/index.m3u8', manifest_view, name='video_manifest'),
+    path('video/<int:movie_id>/<str:resolution>/<str:segment>/', segment_view, name='video_segment'),
+    path('upload/', upload_create_view, name='upload_create'),
+    path('upload/<uuid:upload_id>/', upload_detail_view, name='upload_detail'),
+    path('upload/<uuid:upload_id>/complete/', upload_complete_view, name='upload_complete'),
 ]
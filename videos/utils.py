@@ -1,7 +1,126 @@
 """Utility functions for video streaming."""
 import os
+import re
+import stat
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import quote
 from django.conf import settings
-from django.http import FileResponse, Http404
+from django.http import FileResponse, Http404, HttpResponse
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, parse_http_date_safe
+from core.metrics import CACHE_LOOKUPS, HLS_BYTES, HLS_CACHE_BYTES, HLS_CACHE_EVICTIONS
+from .signing import build_segment_query, limit_cache_control, sign_manifest
+
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+SEGMENT_INDEX_RE = re.compile(r'(\d+)\.ts$')
+MANIFEST_NAME = 'index.m3u8'
+MANIFEST_CONTENT_TYPE = 'application/vnd.apple.mpegurl'
+SEGMENT_CONTENT_TYPE = 'video/MP2T'
+HLS_KINDS = {MANIFEST_CONTENT_TYPE: 'manifest', SEGMENT_CONTENT_TYPE: 'segment'}
+
+
+class RangeNotSatisfiable(Exception):
+    """Raised when a byte range starts beyond the end of the file."""
+
+
+class RangeFile:
+    """File wrapper limiting reads to a byte range while keeping fileno()."""
+
+    def __init__(self, handle, length):
+        self.handle = handle
+        self.remaining = length
+
+    def read(self, size=-1):
+        """Read at most the remaining bytes of the range."""
+        if size < 0 or size > self.remaining:
+            size = self.remaining
+        data = self.handle.read(size)
+        self.remaining -= len(data)
+        return data
+
+    def fileno(self):
+        """Expose file descriptor so WSGI servers can use sendfile."""
+        return self.handle.fileno()
+
+    def close(self):
+        """Close the underlying file."""
+        self.handle.close()
+
+
+class HotFile:
+    """Content and validators of a cached HLS file."""
+
+    def __init__(self, data, file_stat):
+        self.data = data
+        self.size = len(data)
+        self.mtime_ns = file_stat.st_mtime_ns
+        self.etag = build_etag(file_stat)
+        self.last_modified = int(file_stat.st_mtime)
+        self.checked_at = time.monotonic()
+
+
+class HotFileCache:
+    """LRU cache of manifests and leading segments keyed by (movie, resolution, name, mtime_ns)."""
+
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.versions = {}  # newest cached mtime per file, for hits without a stat call
+        self.size = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, max_age):
+        """Return newest cached version of a file if checked against the disk within max_age seconds."""
+        with self.lock:
+            version = self.versions.get(key)
+            entry = self.entries.get(key + (version,)) if version is not None else None
+            if entry is None or time.monotonic() - entry.checked_at >= max_age:
+                return None
+            self.entries.move_to_end(key + (version,))
+            return entry
+
+    def lookup(self, key, file_stat):
+        """Return entry of the file version described by file_stat, marking it checked."""
+        version_key = key + (file_stat.st_mtime_ns,)
+        with self.lock:
+            entry = self.entries.get(version_key)
+            if entry is None or entry.etag != build_etag(file_stat):
+                return None
+            entry.checked_at = time.monotonic()
+            self.versions[key] = entry.mtime_ns
+            self.entries.move_to_end(version_key)
+            return entry
+
+    def fits(self, size):
+        """Return True if a file is small enough to be cached."""
+        return size <= settings.HLS_HOT_CACHE_BYTES // 8
+
+    def put(self, key, entry):
+        """Store entry as the newest version of its file, evicting least recently used files."""
+        with self.lock:
+            if key in self.versions:
+                self.remove(key + (self.versions[key],))
+            self.entries[key + (entry.mtime_ns,)] = entry
+            self.versions[key] = entry.mtime_ns
+            self.size += entry.size
+            while self.size > settings.HLS_HOT_CACHE_BYTES:
+                self.remove(next(iter(self.entries)))
+                HLS_CACHE_EVICTIONS.inc()
+            HLS_CACHE_BYTES.set(self.size)
+
+    def remove(self, version_key):
+        """Drop one entry while holding the lock."""
+        entry = self.entries.pop(version_key, None)
+        if entry is None:
+            return
+        self.size -= entry.size
+        key = version_key[:-1]
+        if self.versions.get(key) == version_key[-1]:
+            del self.versions[key]
+
+
+hot_files = HotFileCache()
 
 
 def get_hls_base_path(movie_id, resolution):
@@ -12,7 +131,7 @@ def get_hls_base_path(movie_id, resolution):
 def get_manifest_path(movie_id, resolution):
     """Return path to HLS manifest file."""
     base = get_hls_base_path(movie_id, resolution)
-    return os.path.join(base, 'index.m3u8')
+    return os.path.join(base, MANIFEST_NAME)
 
 
 def get_segment_path(movie_id, resolution, segment):
@@ -21,20 +140,241 @@ def get_segment_path(movie_id, resolution, segment):
     return os.path.join(base, segment)
 
 
-def serve_file(file_path, content_type):
-    """Serve file as FileResponse or raise 404."""
-    if not os.path.exists(file_path):
+def get_hot_key(movie_id, resolution, name):
+    """Return hot cache key of a manifest or leading segment, or None if it is not cached."""
+    if not settings.HLS_HOT_CACHE_BYTES or settings.HLS_OFFLOAD:
+        return None
+    if name != MANIFEST_NAME:
+        match = SEGMENT_INDEX_RE.search(name)
+        if not match or int(match.group(1)) >= settings.HLS_HOT_CACHE_SEGMENTS:
+            return None
+    return (movie_id, resolution, name)
+
+
+def get_hot_file(key, file_path):
+    """Return cached file, loading it on a miss; None if it is too large to cache."""
+    entry = get_fresh_hot_file(key)
+    return entry if entry is not None else load_hot_file(key, file_path)
+
+
+def get_fresh_hot_file(key):
+    """Return entry that may be served without touching the filesystem."""
+    max_age = settings.HLS_HOT_CACHE_MANIFEST_TTL if key[2] == MANIFEST_NAME else 0
+    entry = hot_files.get(key, max_age)
+    if entry is not None:
+        CACHE_LOOKUPS.labels('hls', 'hit').inc()
+    return entry
+
+
+def load_hot_file(key, file_path):
+    """Revalidate cached file against the disk, or read and cache it."""
+    file_stat = stat_file(file_path)
+    entry = hot_files.lookup(key, file_stat)
+    if entry is not None:
+        CACHE_LOOKUPS.labels('hls', 'hit').inc()
+        return entry
+    CACHE_LOOKUPS.labels('hls', 'miss').inc()
+    if not hot_files.fits(file_stat.st_size):
+        return None
+    with open(file_path, 'rb') as handle:
+        file_stat = os.fstat(handle.fileno())
+        data = handle.read()
+    if len(data) != file_stat.st_size:
+        return None
+    entry = HotFile(data, file_stat)
+    hot_files.put(key, entry)
+    return entry
+
+
+def serve_hot_file(request, entry, content_type, cache_control):
+    """Serve cached file like serve_file, without filesystem access."""
+    response = get_conditional_response(request, etag=entry.etag, last_modified=entry.last_modified)
+    if response is None:
+        response = build_hot_response(request, entry, content_type)
+        HLS_BYTES.labels(HLS_KINDS[content_type]).inc(int(response.get('Content-Length', 0)))
+    return set_validators(response, entry.etag, entry.last_modified, cache_control)
+
+
+def build_hot_response(request, entry, content_type):
+    """Return full response sharing the cached bytes, or a single range copied from them."""
+    try:
+        byte_range = get_requested_range(request, entry.size, entry.etag, entry.last_modified)
+    except RangeNotSatisfiable:
+        return range_not_satisfiable(content_type, entry.size)
+    if byte_range is None:
+        response = HttpResponse(entry.data, content_type=content_type)
+        response['Content-Length'] = str(entry.size)
+    else:
+        start, end = byte_range
+        response = HttpResponse(entry.data[start:end + 1], status=206, content_type=content_type)
+        response['Content-Length'] = str(end - start + 1)
+        response['Content-Range'] = f'bytes {start}-{end}/{entry.size}'
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def stat_file(file_path):
+    """Return stat result of a regular file, or raise 404."""
+    try:
+        file_stat = os.stat(file_path)
+    except OSError:
+        raise Http404("File not found")
+    if not stat.S_ISREG(file_stat.st_mode):
         raise Http404("File not found")
-    return FileResponse(open(file_path, 'rb'), content_type=content_type)
+    return file_stat
+
+
+def serve_file(request, file_path, content_type, cache_control, hot_key=None):
+    """Serve file with validators, conditional and range support, or raise 404."""
+    entry = get_hot_file(hot_key, file_path) if hot_key else None
+    if entry is not None:
+        return serve_hot_file(request, entry, content_type, cache_control)
+    file_stat = stat_file(file_path)
+    etag = build_etag(file_stat)
+    last_modified = int(file_stat.st_mtime)
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None and settings.HLS_OFFLOAD:
+        response = offload_file(file_path, content_type)
+        HLS_BYTES.labels(HLS_KINDS[content_type]).inc(file_stat.st_size)
+    elif response is None:
+        response = build_file_response(request, file_path, file_stat, content_type, etag)
+        HLS_BYTES.labels(HLS_KINDS[content_type]).inc(int(response.get('Content-Length', 0)))
+    return set_validators(response, etag, last_modified, cache_control)
+
+
+def set_validators(response, etag, last_modified, cache_control):
+    """Add ETag, Last-Modified and caching headers to successful file responses."""
+    if response.status_code in (200, 206, 304):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        patch_cache_control(response, **cache_control)
+    return response
+
+
+def build_etag(file_stat):
+    """Return strong ETag derived from inode, mtime and size."""
+    return f'"{file_stat.st_ino:x}-{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"'
+
+
+def build_file_response(request, file_path, file_stat, content_type, etag):
+    """Return full or single-range file response."""
+    size = file_stat.st_size
+    try:
+        byte_range = get_requested_range(request, size, etag, int(file_stat.st_mtime))
+    except RangeNotSatisfiable:
+        return range_not_satisfiable(content_type, size)
+    if byte_range is None:
+        response = FileResponse(open(file_path, 'rb'), content_type=content_type)
+    else:
+        response = build_range_response(file_path, content_type, byte_range, size)
+    response['Accept-Ranges'] = 'bytes'
+    return response
+
+
+def range_not_satisfiable(content_type, size):
+    """Return 416 response reporting the file size."""
+    response = HttpResponse(status=416, content_type=content_type)
+    response['Content-Range'] = f'bytes */{size}'
+    return response
+
+
+def build_range_response(file_path, content_type, byte_range, size):
+    """Return 206 response streaming only the requested bytes."""
+    start, end = byte_range
+    handle = open(file_path, 'rb')
+    handle.seek(start)
+    response = FileResponse(RangeFile(handle, end - start + 1), status=206, content_type=content_type)
+    response['Content-Length'] = str(end - start + 1)
+    response['Content-Range'] = f'bytes {start}-{end}/{size}'
+    return response
 
 
-def serve_manifest(movie_id, resolution):
-    """Serve HLS manifest file."""
+def get_requested_range(request, size, etag, last_modified):
+    """Return (start, end) if a valid single range applies, else None."""
+    header = request.META.get('HTTP_RANGE')
+    if not header or not if_range_matches(request, etag, last_modified):
+        return None
+    return parse_range(header, size)
+
+
+def if_range_matches(request, etag, last_modified):
+    """Return True if If-Range is absent or still matches the file."""
+    if_range = request.META.get('HTTP_IF_RANGE')
+    if not if_range:
+        return True
+    if if_range.startswith('"'):
+        return if_range == etag
+    return parse_http_date_safe(if_range) == last_modified
+
+
+def parse_range(header, size):
+    """Parse a single RFC 7233 byte range, ignoring unsupported forms."""
+    match = RANGE_RE.match(header.strip())
+    if not match or match.groups() == ('', ''):
+        return None
+    first, last = match.groups()
+    if not first:
+        if int(last) == 0:
+            raise RangeNotSatisfiable
+        return max(0, size - int(last)), size - 1
+    start = int(first)
+    end = min(int(last), size - 1) if last else size - 1
+    if start >= size:
+        raise RangeNotSatisfiable
+    return (start, end) if end >= start else None
+
+
+def offload_file(file_path, content_type):
+    """Return empty response telling the proxy to send the file itself."""
+    response = HttpResponse(content_type=content_type)
+    if settings.HLS_OFFLOAD == 'nginx':
+        relative = os.path.relpath(file_path, os.path.join(settings.MEDIA_ROOT, 'hls'))
+        response['X-Accel-Redirect'] = settings.HLS_ACCEL_PREFIX + quote(relative)
+    else:
+        response['X-Sendfile'] = file_path
+    return response
+
+
+def serve_manifest(request, movie_id, resolution):
+    """Serve HLS manifest file with a short cache lifetime."""
     path = get_manifest_path(movie_id, resolution)
-    return serve_file(path, 'application/vnd.apple.mpegurl')
+    if settings.HLS_SIGNED_URLS:
+        return serve_signed_manifest(request, path, movie_id, resolution)
+    cache_control = settings.HLS_MANIFEST_CACHE_CONTROL
+    hot_key = get_hot_key(movie_id, resolution, MANIFEST_NAME)
+    return serve_file(request, path, MANIFEST_CONTENT_TYPE, cache_control, hot_key)
 
 
-def serve_segment(movie_id, resolution, segment):
-    """Serve HLS segment file."""
+def serve_signed_manifest(request, path, movie_id, resolution):
+    """Serve manifest whose segment URIs carry a signature for this user."""
+    content = read_manifest(path, get_hot_key(movie_id, resolution, MANIFEST_NAME))
+    query = build_segment_query(request.user.pk, movie_id, resolution)
+    response = HttpResponse(sign_manifest(content, query), content_type=MANIFEST_CONTENT_TYPE)
+    HLS_BYTES.labels('manifest').inc(len(response.content))
+    patch_cache_control(response, **settings.HLS_MANIFEST_CACHE_CONTROL)
+    return response
+
+
+def read_manifest(path, hot_key=None):
+    """Return manifest text, from the hot file cache if possible, or raise 404."""
+    entry = get_hot_file(hot_key, path) if hot_key else None
+    if entry is not None:
+        return entry.data.decode()
+    if not os.path.isfile(path):
+        raise Http404("File not found")
+    with open(path) as handle:
+        return handle.read()
+
+
+def serve_segment(request, movie_id, resolution, segment):
+    """Serve HLS segment file with a long immutable cache lifetime."""
     path = get_segment_path(movie_id, resolution, segment)
-    return serve_file(path, 'video/MP2T')
+    hot_key = get_hot_key(movie_id, resolution, segment)
+    return serve_file(request, path, SEGMENT_CONTENT_TYPE, get_segment_cache_control(request), hot_key)
+
+
+def get_segment_cache_control(request):
+    """Return segment caching headers, expiring cached copies with the URL signature."""
+    if not settings.HLS_SIGNED_URLS:
+        return settings.HLS_SEGMENT_CACHE_CONTROL
+    return limit_cache_control(settings.HLS_SEGMENT_CACHE_CONTROL, int(request.GET['e']))
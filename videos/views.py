@@ -1,32 +1,222 @@
 """Views for video streaming endpoints."""
-from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed, NotAuthenticated, PermissionDenied
+from rest_framework.decorators import api_view, permission_classes, authentication_classes
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
-from django.views.decorators.cache import cache_page
-from .models import Video
-from .serializers import VideoSerializer
+from rest_framework.settings import api_settings
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.http import Http404, HttpResponse, JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.views.decorators.http import require_safe
+from redis.exceptions import LockError
+import django_rq
+from users.authentication import CookieJWTAuthentication
+from .catalog import get_catalog, get_playable_videos
+from .models import Upload
+from .pagination import VideoCursorPagination
+from .permissions import HasSegmentSignature
+from .queues import TRANSCODE_HIGH, is_queue_full
+from .serializers import VideoSerializer, VideoUploadSerializer
+from .signing import verify_segment_query
+from .streaming import aserve_manifest, aserve_segment
+from .uploads import (
+    TUS_VERSION, UPLOAD_CONTENT_TYPE, create_upload_file, delete_upload_file,
+    get_upload_path, parse_metadata, write_chunk
+)
 from .utils import serve_manifest, serve_segment
 
+PAGINATION_PARAMS = {'cursor', 'page_size', 'category'}
+
+if settings.HLS_SIGNED_URLS:
+    SEGMENT_AUTHENTICATION = []
+    SEGMENT_PERMISSIONS = [HasSegmentSignature]
+else:
+    SEGMENT_AUTHENTICATION = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+    SEGMENT_PERMISSIONS = [IsAuthenticated]
+
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
-@cache_page(60 * 15)
 def video_list_view(request):
-    """Return cached list of all available videos."""
-    videos = Video.objects.all()
-    serializer = VideoSerializer(videos, many=True, context={'request': request})
-    return Response(serializer.data)
+    """Return prebuilt catalog of all videos, or 304 if unchanged."""
+    if PAGINATION_PARAMS & set(request.query_params):
+        return paginated_video_list(request)
+    entry = get_catalog(f'{request.scheme}://{request.get_host()}')
+    response = get_conditional_response(request, etag=entry['etag'])
+    if response is None:
+        response = HttpResponse(entry['body'], content_type='application/json')
+    response['ETag'] = entry['etag']
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def paginated_video_list(request):
+    """Return one cursor page of playable videos, optionally filtered by category."""
+    videos = get_playable_videos()
+    category = request.query_params.get('category')
+    if category:
+        videos = videos.filter(category=category)
+    paginator = VideoCursorPagination()
+    page = paginator.paginate_queryset(videos, request)
+    serializer = VideoSerializer(page, many=True, context={'request': request})
+    return paginator.get_paginated_response(serializer.data)
 
 
 @api_view(['GET'])
 @permission_classes([IsAuthenticated])
 def video_manifest_view(request, movie_id, resolution):
     """Return HLS manifest for video at specified resolution."""
-    return serve_manifest(movie_id, resolution)
+    return serve_manifest(request, movie_id, resolution)
 
 
 @api_view(['GET'])
-@permission_classes([IsAuthenticated])
+@authentication_classes(SEGMENT_AUTHENTICATION)
+@permission_classes(SEGMENT_PERMISSIONS)
 def video_segment_view(request, movie_id, resolution, segment):
     """Return HLS segment for video playback."""
-    return serve_segment(movie_id, resolution, segment)
\ No newline at end of file
+    return serve_segment(request, movie_id, resolution, segment)
+
+
+async def authenticate_async(request):
+    """Set request.user from the access cookie, or return the 401 DRF would send."""
+    try:
+        result = await CookieJWTAuthentication().aauthenticate(request)
+    except AuthenticationFailed as error:
+        return unauthorized(error.detail)
+    if result is None:
+        return unauthorized(NotAuthenticated.default_detail)
+    request.user = result[0]
+    return None
+
+
+def api_error(detail, status_code):
+    """Return JSON error shaped like DRF's exception handler output."""
+    return JsonResponse(detail if isinstance(detail, dict) else {'detail': detail}, status=status_code)
+
+
+def unauthorized(detail):
+    """Return 401 with the challenge header DRF adds for JWT authentication."""
+    response = api_error(detail, 401)
+    response['WWW-Authenticate'] = 'Bearer realm="api"'
+    return response
+
+
+@require_safe
+async def video_manifest_async_view(request, movie_id, resolution):
+    """Async variant of video_manifest_view for ASGI deployments."""
+    response = await authenticate_async(request)
+    if response:
+        return response
+    try:
+        return await aserve_manifest(request, movie_id, resolution)
+    except Http404 as error:
+        return api_error(str(error), 404)
+
+
+@require_safe
+async def video_segment_async_view(request, movie_id, resolution, segment):
+    """Async variant of video_segment_view streaming the segment without holding a worker."""
+    if settings.HLS_SIGNED_URLS:
+        if not verify_segment_query(request.GET, movie_id, resolution):
+            return api_error(PermissionDenied.default_detail, 403)
+    else:
+        response = await authenticate_async(request)
+        if response:
+            return response
+    try:
+        return await aserve_segment(request, movie_id, resolution, segment)
+    except Http404 as error:
+        return api_error(str(error), 404)
+
+
+def tus_response(status_code, data=None, **headers):
+    """Return response carrying the tus protocol headers."""
+    headers = {'Tus-Resumable': TUS_VERSION, 'Cache-Control': 'no-store', **headers}
+    return Response(data, status=status_code, headers=headers)
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def upload_create_view(request):
+    """Register a resumable upload and create its empty target file."""
+    try:
+        size = int(request.headers['Upload-Length'])
+        metadata = parse_metadata(request.headers.get('Upload-Metadata', ''))
+    except (KeyError, ValueError):
+        return tus_response(status.HTTP_400_BAD_REQUEST, {'error': 'Valid Upload-Length header required.'})
+    if size <= 0 or size > settings.UPLOAD_MAX_SIZE:
+        return tus_response(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, {'error': 'Upload size not allowed.'})
+    if is_queue_full(django_rq.get_queue(TRANSCODE_HIGH)):
+        return tus_response(
+            status.HTTP_503_SERVICE_UNAVAILABLE, {'error': 'Transcode queue is full.'}, **{'Retry-After': '60'}
+        )
+    filename = metadata.get('filename', 'upload.mp4')
+    upload = Upload(created_by=request.user, filename=filename, size=size)
+    upload.file_path = get_upload_path(upload.pk, filename)
+    create_upload_file(upload)
+    upload.save()
+    location = request.build_absolute_uri(f'{upload.pk}/')
+    return tus_response(status.HTTP_201_CREATED, Location=location, **{'Upload-Offset': '0'})
+
+
+@api_view(['HEAD', 'PATCH', 'DELETE'])
+@permission_classes([IsAdminUser])
+def upload_detail_view(request, upload_id):
+    """Report, append to or abort a resumable upload."""
+    upload = get_object_or_404(Upload, pk=upload_id, video__isnull=True)
+    if request.method == 'HEAD':
+        return tus_response(
+            status.HTTP_200_OK, **{'Upload-Offset': str(upload.offset), 'Upload-Length': str(upload.size)}
+        )
+    try:
+        with cache.lock(f'upload:{upload.pk}', timeout=600, blocking=False):
+            if request.method == 'DELETE':
+                delete_upload_file(upload)
+                upload.delete()
+                return tus_response(status.HTTP_204_NO_CONTENT)
+            return append_upload_chunk(request, upload)
+    except LockError:
+        return tus_response(status.HTTP_423_LOCKED, {'error': 'Upload is in use.'})
+
+
+def append_upload_chunk(request, upload):
+    """Write one PATCH body at the committed offset and commit the new offset."""
+    if request.content_type != UPLOAD_CONTENT_TYPE:
+        return tus_response(status.HTTP_415_UNSUPPORTED_MEDIA_TYPE)
+    upload.refresh_from_db()
+    try:
+        offset = int(request.headers['Upload-Offset'])
+        length = int(request.headers['Content-Length'])
+    except (KeyError, ValueError):
+        return tus_response(status.HTTP_400_BAD_REQUEST, {'error': 'Upload-Offset and Content-Length required.'})
+    if offset != upload.offset:
+        return tus_response(status.HTTP_409_CONFLICT, **{'Upload-Offset': str(upload.offset)})
+    if offset + length > upload.size:
+        return tus_response(status.HTTP_413_REQUEST_ENTITY_TOO_LARGE, {'error': 'Chunk exceeds Upload-Length.'})
+    new_offset = write_chunk(upload, request.stream, length)
+    updated = Upload.objects.filter(pk=upload.pk, offset=offset).update(offset=new_offset, sha256=upload.sha256)
+    if not updated:
+        return tus_response(status.HTTP_409_CONFLICT)
+    return tus_response(status.HTTP_204_NO_CONTENT, **{'Upload-Offset': str(new_offset)})
+
+
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def upload_complete_view(request, upload_id):
+    """Create the video for a fully received upload, starting HLS conversion."""
+    upload = get_object_or_404(Upload, pk=upload_id, video__isnull=True)
+    if not upload.is_complete:
+        return Response(
+            {'error': 'Upload incomplete.', 'offset': upload.offset, 'size': upload.size},
+            status=status.HTTP_409_CONFLICT
+        )
+    serializer = VideoUploadSerializer(data=request.data)
+    serializer.is_valid(raise_exception=True)
+    with transaction.atomic():
+        video = serializer.save(video_file=upload.file_path, content_hash=upload.sha256)
+        Upload.objects.filter(pk=upload.pk).update(video=video)
+    return Response(serializer.data, status=status.HTTP_201_CREATED)